@@ -5,17 +5,27 @@ A FastAPI application that generates Manim animations from text queries using La
 
 import os
 import sys
+import time
+import asyncio
+import functools
 import tempfile
 import subprocess
 import shutil
 import base64
+import hashlib
+import json
+import re
 from pathlib import Path
-from typing import TypedDict, Annotated, Optional, List
+from contextvars import ContextVar
+from typing import TypedDict, Annotated, Dict, Optional, List, Tuple
 from dotenv import load_dotenv
 
+# Measure how long third-party imports take (first phase of the startup breakdown)
+_import_start = time.perf_counter()
+
 # FastAPI imports
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
@@ -24,8 +34,7 @@ from langgraph.graph import StateGraph, START, END
 from typing import Literal
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.documents import Document
 
 # Import prompts from separate module
 from prompts import (
@@ -33,9 +42,50 @@ from prompts import (
     SYNTAX_QUESTIONS_PROMPT,
     CODE_GENERATION_PROMPT,
     CODE_FIXING_PROMPT,
+    PLANNING_PROMPT,
     FALLBACK_SYNTAX_QUESTIONS
 )
 
+# Background jobs with per-node progress events
+from jobs import JobManager, Job, track_node, TERMINAL_STATES
+
+# Bounded render worker pool with priorities
+from render_pool import RenderScheduler, PRIORITY_INTERACTIVE, PRIORITY_GENERATE, PRIORITY_UPGRADE
+
+# Content-addressed cache of rendered videos
+from render_cache import RenderCache
+
+# Persistent cache of LLM responses
+from llm_cache import LLMCache
+
+# Batched, cached retrieval for the RAG node
+from retrieval import CachedEmbeddings, batch_similarity_search, hybrid_search, extract_api_queries
+
+# Lazy resources and startup phase timings
+from startup import LazyResource, timed_phase, startup_timings, format_timings
+
+# Deduplicated, token-budgeted RAG context for code generation
+from context_packer import pack_context
+# Incremental fence stripping and early validation of streamed code
+from code_stream import CodeStreamChecker
+# Static pre-flight checks against an index of the installed manim API
+from manim_api_index import ManimApiIndex
+from preflight import check_code
+# Persistent process with manim pre-imported that forks a child per render
+from manim_server import ForkServerClient, fork_server_supported
+# Split long scenes into animation ranges rendered in parallel and joined with stream copy
+from segment_render import count_played_animations, plan_segments, supports_segments, segment_flags, concat_videos
+# Rename-instead-of-copy delivery, faststart MP4 rewriting and ETags
+from video_delivery import deliver_video, video_etag, etag_matches
+# Size/age quota and cleanup for everything renders write to disk
+from artifact_store import ArtifactStore
+# SQLite metadata of every render (query, code hash, timings, status) for lookups and history
+from artifact_index import ArtifactIndex, ARTIFACT_SUCCEEDED, ARTIFACT_FAILED, ARTIFACT_CANCELLED
+# Known-error patches (rewrite rules + fixes learned from review_code) applied without an LLM
+from fix_cache import FixCache, error_signatures
+
+startup_timings["imports"] = round(time.perf_counter() - _import_start, 3)
+
 # Load environment variables
 load_dotenv()
 
@@ -60,20 +110,194 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 if GOOGLE_API_KEY:
     GOOGLE_API_KEY = GOOGLE_API_KEY.strip().strip('"').strip("'")
 
-# Initialize LLMs - different models for different tasks
+# LLMs are created on first use (or by the startup task) - different models for different tasks
 # Fast model for simple tasks (story, questions)
-llm_fast = ChatGoogleGenerativeAI(
+llm_fast = LazyResource("llm_fast", lambda: ChatGoogleGenerativeAI(
     model="gemini-2.5-flash-lite",
     temperature=0.3,
     api_key=GOOGLE_API_KEY
-)
+))
 
 # Better model for code generation (needs to follow complex instructions)
-llm_code = ChatGoogleGenerativeAI(
+llm_code = LazyResource("llm_code", lambda: ChatGoogleGenerativeAI(
     model="gemini-2.5-flash",
     temperature=0.2,  # Lower temperature for more deterministic code
     api_key=GOOGLE_API_KEY
-)
+))
+
+# Fast model in JSON mode for the fused planner (story + questions in one call)
+llm_plan = LazyResource("llm_plan", lambda: ChatGoogleGenerativeAI(
+    model="gemini-2.5-flash-lite",
+    temperature=0.3,
+    response_mime_type="application/json",
+    api_key=GOOGLE_API_KEY
+))
+
+# Fix stage: FIX_CANDIDATES fixes are requested and rendered concurrently (temperatures spread
+# over FIX_TEMPERATURE_RANGE); the first one that renders wins, the deadline bounds the stage
+FIX_CANDIDATES = max(1, int(os.getenv("FIX_CANDIDATES", "3")))
+FIX_TEMPERATURE_RANGE = tuple(float(t) for t in os.getenv("FIX_TEMPERATURE_RANGE", "0.2,0.8").split(","))
+FIX_DEADLINE = int(os.getenv("FIX_DEADLINE", "240"))
+
+_fix_llms = {}
+
+
+def fix_llm(temperature: float) -> ChatGoogleGenerativeAI:
+    """
+    The code model at the given temperature (llm_code itself at its own temperature).
+    """
+    if temperature == llm_code.get().temperature:
+        return llm_code.get()
+    if temperature not in _fix_llms:
+        _fix_llms[temperature] = ChatGoogleGenerativeAI(
+            model="gemini-2.5-flash",
+            temperature=temperature,
+            api_key=GOOGLE_API_KEY
+        )
+    return _fix_llms[temperature]
+
+
+def fix_temperatures(count: int = FIX_CANDIDATES) -> List[float]:
+    low, high = FIX_TEMPERATURE_RANGE[0], FIX_TEMPERATURE_RANGE[-1]
+    if count == 1:
+        return [low]
+    return [round(low + (high - low) * i / (count - 1), 2) for i in range(count)]
+
+# "separate": generate_story -> generate_syntax_questions (two LLM calls)
+# "fused": plan_animation (one structured LLM call)
+PLANNER_MODE = os.getenv("PLANNER_MODE", "separate").lower()
+
+# Speculative retrieval: search the docs for the raw query (and API names picked out of it
+# locally) in parallel with the planner; question-driven retrieval then only fills gaps
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "false").lower() in ("1", "true", "yes")
+
+
+# LLM response cache - identical prompts to the same model skip the round trip
+# Stages: generate_story, generate_syntax_questions, plan_animation, generate_code, review_code
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_STAGES = os.getenv("LLM_CACHE_STAGES", "generate_story,generate_syntax_questions,plan_animation,generate_code,review_code")
+llm_cache = LLMCache(
+    Path(os.getenv("LLM_CACHE_PATH", "./cache/llm_responses.sqlite3")),
+    ttl_seconds=int(os.getenv("LLM_CACHE_TTL_HOURS", "168")) * 3600,
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000")),
+    enabled_stages=[stage.strip() for stage in LLM_CACHE_STAGES.split(",") if stage.strip()]
+) if LLM_CACHE_ENABLED else None
+
+
+# Fix cache - known errors are patched and re-rendered without an LLM round trip
+FIX_CACHE_ENABLED = os.getenv("FIX_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+FIX_CACHE_MAX_ROUNDS = int(os.getenv("FIX_CACHE_MAX_ROUNDS", "3"))
+fix_cache = FixCache(
+    Path(os.getenv("FIX_CACHE_PATH", "./cache/fix_cache.sqlite3"))
+) if FIX_CACHE_ENABLED else None
+
+
+def llm_cache_key(llm: ChatGoogleGenerativeAI, messages: list) -> str:
+    """
+    Cache key for a (system, human) message pair sent to `llm`.
+    """
+    return LLMCache.make_key(llm.model, llm.temperature, messages[0].content, messages[-1].content)
+
+
+async def invoke_llm(stage: str, llm: ChatGoogleGenerativeAI, messages: list) -> str:
+    """
+    Call the LLM for a pipeline stage and return the response text, serving repeats from the LLM cache.
+    """
+    key = None
+    if llm_cache is not None and llm_cache.is_enabled(stage):
+        key = llm_cache_key(llm, messages)
+        cached = await asyncio.to_thread(llm_cache.get, stage, key)
+        if cached is not None:
+            print(f"  ✓ LLM cache hit ({stage})")
+            return cached
+
+    response = await llm.ainvoke(messages)
+    content = response.content
+
+    if key is not None:
+        await asyncio.to_thread(llm_cache.put, stage, key, llm.model, content)
+    return content
+
+
+# Code completions are streamed and cancelled as soon as they are known to be unusable
+CODE_STREAM_RETRIES = int(os.getenv("CODE_STREAM_RETRIES", "1"))
+CODE_STREAM_MAX_CHARS = int(os.getenv("CODE_STREAM_MAX_CHARS", "20000"))
+
+
+def _chunk_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    # Some models stream content as a list of parts
+    return "".join(part if isinstance(part, str) else part.get("text", "") for part in content)
+
+
+async def stream_code(stage: str, llm: ChatGoogleGenerativeAI, messages: list) -> Tuple[str, Optional[str]]:
+    """
+    Stream a code completion, stripping markdown fences as it arrives.
+    Returns (code, problem); the stream is cancelled as soon as a fatal problem is detected.
+    Only usable responses are stored in the LLM cache.
+    """
+    checker = CodeStreamChecker(max_chars=CODE_STREAM_MAX_CHARS)
+
+    key = None
+    if llm_cache is not None and llm_cache.is_enabled(stage):
+        key = llm_cache_key(llm, messages)
+        cached = await asyncio.to_thread(llm_cache.get, stage, key)
+        if cached is not None:
+            print(f"  ✓ LLM cache hit ({stage})")
+            checker.feed(cached)
+            return checker.finish()
+
+    start = time.perf_counter()
+    raw = []
+    stream = llm.astream(messages)
+    try:
+        async for chunk in stream:
+            text = _chunk_text(chunk.content)
+            raw.append(text)
+            problem = checker.feed(text)
+            if problem is not None:
+                print(f"  ✗ Aborted {stage} stream after {time.perf_counter() - start:.1f}s "
+                      f"({len(checker.code)} chars): {problem}")
+                return checker.code, problem
+            if checker.closed:
+                # Anything after the closing fence is commentary we don't need
+                break
+    finally:
+        await stream.aclose()
+
+    code, problem = checker.finish()
+    if problem is not None:
+        print(f"  ✗ {stage} response unusable after {time.perf_counter() - start:.1f}s: {problem}")
+    elif key is not None:
+        await asyncio.to_thread(llm_cache.put, stage, key, llm.model, "".join(raw))
+    return code, problem
+
+
+async def stream_code_with_retry(
+    stage: str,
+    system_message: SystemMessage,
+    user_content: str,
+    llm: Optional[ChatGoogleGenerativeAI] = None
+) -> Tuple[str, Optional[str], list]:
+    """
+    stream_code with up to CODE_STREAM_RETRIES immediate retries; each retry is told why
+    the previous attempt was rejected. Returns (code, problem, messages of the last attempt).
+    `llm` defaults to llm_code.
+    """
+    llm = llm or llm_code.get()
+    messages = [system_message, HumanMessage(content=user_content)]
+    code, problem = await stream_code(stage, llm, messages)
+    for attempt in range(CODE_STREAM_RETRIES):
+        if problem is None:
+            break
+        print(f"  ↻ Retrying {stage} ({attempt + 1}/{CODE_STREAM_RETRIES})...")
+        messages = [system_message, HumanMessage(content=f"""{user_content}
+NOTE: A previous answer was rejected ({problem}).
+Return the complete code for class Scene1 in a single ```python block.
+""")]
+        code, problem = await stream_code(stage, llm, messages)
+    return code, problem, messages
 
 
 # Get the directory where this script is located
@@ -81,31 +305,736 @@ SCRIPT_DIR = Path(__file__).parent.resolve()
 
 # Initialize ChromaDB vector store for RAG
 CHROMA_DB_PATH = str(SCRIPT_DIR / "chroma_db_manim")
-embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2",
-    model_kwargs={'device': 'cpu'},
-    encode_kwargs={'normalize_embeddings': True}
-) 
-
-# Load vector store
-try:
-    vectorstore = Chroma(
-        persist_directory=CHROMA_DB_PATH,
-        embedding_function=embeddings,
-        collection_name="manim_docs"
+
+# Vector store backend: "chroma" (default) or "numpy" (memory-mapped index, falls back to Chroma if missing)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+NUMPY_INDEX_PATH = Path(os.getenv("NUMPY_INDEX_PATH", str(SCRIPT_DIR / "manim_docs_index")))
+
+# Retrieval mode: "hybrid" fuses BM25 and dense rankings (reciprocal rank fusion), "dense" uses embeddings only
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+BM25_INDEX_PATH = Path(os.getenv("BM25_INDEX_PATH", str(SCRIPT_DIR / "manim_docs_bm25.json")))
+
+# Maximum (estimated) tokens of documentation packed into the code generation prompt
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1500"))
+
+
+
+def load_embeddings() -> CachedEmbeddings:
+    """
+    Load the sentence-transformers model (the slowest startup phase).
+    Query embeddings are LRU-cached - default and fallback questions repeat constantly.
+    """
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    return CachedEmbeddings(
+        HuggingFaceEmbeddings(
+            model_name="sentence-transformers/all-MiniLM-L6-v2",
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs={'normalize_embeddings': True}
+        ),
+        max_size=int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
     )
-    print("✓ ChromaDB vector store loaded successfully")
-except Exception as e:
-    print(f"⚠ Warning: Could not load ChromaDB vector store: {e}")
-    vectorstore = None
+
+
+def load_vectorstore():
+    """
+    Open the configured vector store. Returns None if no store could be loaded.
+    """
+    if VECTOR_BACKEND == "numpy":
+        try:
+            from vector_index import NumpyVectorIndex
+
+            store = NumpyVectorIndex.load(NUMPY_INDEX_PATH, embeddings.get())
+            print(f"✓ NumPy vector index loaded successfully ({len(store)} chunks)")
+            return store
+        except Exception as e:
+            print(f"⚠ Warning: Could not load NumPy vector index, falling back to ChromaDB: {e}")
+
+    try:
+        from langchain_community.vectorstores import Chroma
+
+        store = Chroma(
+            persist_directory=CHROMA_DB_PATH,
+            embedding_function=embeddings.get(),
+            collection_name="manim_docs"
+        )
+        print("✓ ChromaDB vector store loaded successfully")
+        return store
+    except Exception as e:
+        print(f"⚠ Warning: Could not load ChromaDB vector store: {e}")
+        return None
+
+
+def load_lexical_index():
+    """
+    Load the precomputed BM25 index. If the file is missing, build it in memory
+    from the chunks of the loaded vector store. Returns None in dense-only mode.
+    """
+    if RETRIEVAL_MODE != "hybrid":
+        return None
+
+    from lexical_index import BM25Index
+
+    if BM25_INDEX_PATH.exists():
+        try:
+            index = BM25Index.load(BM25_INDEX_PATH)
+            print(f"✓ BM25 index loaded successfully ({len(index)} chunks)")
+            return index
+        except Exception as e:
+            print(f"⚠ Warning: Could not load BM25 index, rebuilding from the vector store: {e}")
+
+    store = vectorstore.get()
+    if store is None:
+        return None
+    try:
+        if hasattr(store, "chunks"):
+            texts = [chunk["text"] for chunk in store.chunks]
+        else:
+            texts = store._collection.get(include=["documents"])["documents"]
+        index = BM25Index.build(texts)
+        print(f"✓ BM25 index built from the vector store ({len(index)} chunks)")
+        return index
+    except Exception as e:
+        print(f"⚠ Warning: Could not build BM25 index, using dense retrieval only: {e}")
+        return None
+
+
+embeddings = LazyResource("embeddings", load_embeddings)
+vectorstore = LazyResource("vectorstore", load_vectorstore)
+lexical_index = LazyResource("lexical_index", load_lexical_index)
+
+
+# Pre-flight validation: generated code is checked against the manim API before rendering
+PREFLIGHT_ENABLED = os.getenv("PREFLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+MANIM_API_INDEX_PATH = Path(os.getenv("MANIM_API_INDEX_PATH", "./cache/manim_api_index.json"))
+
+
+def load_manim_api_index() -> Optional[ManimApiIndex]:
+    """
+    Load the manim API index, building it (in a subprocess that imports manim) when it is
+    missing or was built for another manim version. Returns None if pre-flight is disabled.
+    """
+    if not PREFLIGHT_ENABLED:
+        return None
+    try:
+        index = ManimApiIndex.load_or_build(MANIM_API_INDEX_PATH)
+        print(f"✓ Manim API index loaded ({len(index)} names, manim {index.manim_version})")
+        return index
+    except Exception as e:
+        print(f"⚠ Warning: Could not load the manim API index, pre-flight checks disabled: {e}")
+        return None
+
+
+manim_api_index = LazyResource("manim_api_index", load_manim_api_index)
+
+
+def preflight_issues(code: str) -> List[str]:
+    """
+    Pre-flight problems in the code (empty when none were found or the index is unavailable).
+    """
+    index = manim_api_index.get()
+    if index is None:
+        return []
+    try:
+        return check_code(code, index)
+    except Exception as e:
+        print(f"⚠ Warning: Pre-flight check crashed, skipping it: {e}")
+        return []
+
 
 # Create output directory for videos
 OUTPUT_DIR = Path("./generated_videos")
 OUTPUT_DIR.mkdir(exist_ok=True)
 
+# Maximum wall-clock time for a single manim render (seconds)
+MANIM_TIMEOUT = 120
+
+# Quality tiers: manim flag, the media/videos sub-directory manim writes to, and render timeout
+QUALITY_TIERS = {
+    "low": {"flag": "-ql", "dir": "480p15", "timeout": MANIM_TIMEOUT},
+    "medium": {"flag": "-qm", "dir": "720p30", "timeout": 300},
+    "high": {"flag": "-qh", "dir": "1080p60", "timeout": 900},
+    "production": {"flag": "-qp", "dir": "1440p60", "timeout": 1800},
+    "fourk": {"flag": "-qk", "dir": "2160p60", "timeout": 3600}
+}
+
+# Preview renders (pipeline, editor) use PREVIEW_QUALITY; after a successful /generate or /jobs
+# run the same code can be re-rendered at UPGRADE_QUALITY in the background (default "none": off)
+PREVIEW_QUALITY = os.getenv("PREVIEW_QUALITY", "low").lower()
+MANIM_QUALITY_FLAGS = [QUALITY_TIERS[PREVIEW_QUALITY]["flag"]]
+
+
+def resolve_quality(value: Optional[str], default: Optional[str]) -> Optional[str]:
+    """
+    Validate a requested quality tier; None selects the default and "none" disables.
+    """
+    if value is None:
+        value = default
+    if value is None or value.lower() == "none":
+        return None
+    value = value.lower()
+    if value not in QUALITY_TIERS:
+        raise ValueError(f"Unknown quality '{value}', expected one of: {', '.join(QUALITY_TIERS)}, none")
+    return value
+
+
+UPGRADE_QUALITY = resolve_quality(os.getenv("UPGRADE_QUALITY", "none"), None)
+
+# Two-phase render: a dry run executes construct() with animations skipped and no video
+# written, so crashing code fails in seconds; the full render only runs if it passes
+RENDER_DRY_RUN = os.getenv("RENDER_DRY_RUN", "true").lower() in ("1", "true", "yes")
+MANIM_DRY_RUN_FLAGS = ["--dry_run", "-s", QUALITY_TIERS["low"]["flag"]]
+MANIM_DRY_RUN_TIMEOUT = int(os.getenv("MANIM_DRY_RUN_TIMEOUT", "30"))
+dry_run_stats = {"runs": 0, "failed": 0, "timed_out": 0, "seconds": 0.0}
+
+# Move the moov atom of rendered MP4s to the front so playback can start while downloading
+VIDEO_FASTSTART = os.getenv("VIDEO_FASTSTART", "true").lower() in ("1", "true", "yes")
+
+# Artifact store - videos and code in OUTPUT_DIR are evicted least recently used first beyond the
+# quota; a background sweeper removes temp modules and media left behind by failed renders
+ARTIFACT_MAX_MB = int(os.getenv("ARTIFACT_MAX_MB", "2048"))
+ARTIFACT_MAX_AGE_HOURS = float(os.getenv("ARTIFACT_MAX_AGE_HOURS", "168"))
+ARTIFACT_SWEEP_INTERVAL = int(os.getenv("ARTIFACT_SWEEP_INTERVAL", "600"))
+ARTIFACT_TEMP_GRACE = int(os.getenv("ARTIFACT_TEMP_GRACE", "1800"))
+artifact_index = ArtifactIndex(Path(os.getenv("ARTIFACT_INDEX_PATH", "./cache/artifacts.sqlite3")))
+artifact_store = ArtifactStore(
+    OUTPUT_DIR,
+    max_bytes=ARTIFACT_MAX_MB * 1024 * 1024,
+    max_age=ARTIFACT_MAX_AGE_HOURS * 3600,
+    temp_grace=ARTIFACT_TEMP_GRACE,
+    on_evict=lambda artifact_id: artifact_index.mark_evicted([artifact_id])
+)
+
+# Where the renders of the current request / job come from (recorded in the artifact index)
+render_origin: ContextVar[dict] = ContextVar("render_origin", default={"source": "pipeline", "query": None, "job_id": None})
+
+# Render cache - identical code/scene/quality renders are served without running manim
+RENDER_CACHE_ENABLED = os.getenv("RENDER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RENDER_CACHE_MAX_MB = int(os.getenv("RENDER_CACHE_MAX_MB", "1024"))
+render_cache = RenderCache(
+    OUTPUT_DIR / "render_cache",
+    max_bytes=RENDER_CACHE_MAX_MB * 1024 * 1024
+) if RENDER_CACHE_ENABLED else None
+
+
+# Central render scheduler - limits concurrent manim processes (default: number of CPU cores)
+render_scheduler = RenderScheduler(workers=int(os.getenv("RENDER_WORKERS", "0")) or None)
+
+# Renders are not preemptible, so background upgrades may occupy at most UPGRADE_CONCURRENCY workers
+# (default: all but one), keeping a worker free for interactive and pipeline renders
+UPGRADE_CONCURRENCY = max(1, int(os.getenv("UPGRADE_CONCURRENCY", "0")) or render_scheduler.workers - 1)
+upgrade_slots = asyncio.Semaphore(UPGRADE_CONCURRENCY)
+
+
+# Fork server: renders skip Python startup and `import manim` (POSIX only; falls back to subprocesses)
+MANIM_FORK_SERVER = os.getenv("MANIM_FORK_SERVER", "true").lower() in ("1", "true", "yes")
+
+# Per-path render counts and time, for comparing the fork server with plain subprocesses
+render_backend_stats = {
+    "fork_server": {"runs": 0, "seconds": 0.0},
+    "subprocess": {"runs": 0, "seconds": 0.0}
+}
+
+
+def start_fork_server() -> Optional[ForkServerClient]:
+    """
+    Start the manim fork server (imports manim once). Returns None if disabled or unavailable.
+    """
+    if not MANIM_FORK_SERVER or not fork_server_supported():
+        return None
+    try:
+        client = ForkServerClient()
+        client.start()
+        print(f"✓ Manim fork server started ({client.socket_path})")
+        return client
+    except Exception as e:
+        print(f"⚠ Warning: Could not start the manim fork server, using subprocesses: {e}")
+        return None
+
+
+manim_fork_server = LazyResource("manim_fork_server", start_fork_server)
+
+
+# Segment-parallel rendering: a scene's animations are split into ranges (manim -n start,end)
+# rendered concurrently on the scheduler and joined without re-encoding
+RENDER_PARALLEL = os.getenv("RENDER_PARALLEL", "false").lower() in ("1", "true", "yes")
+RENDER_SEGMENTS = int(os.getenv("RENDER_SEGMENTS", "0"))  # 0: one per render worker
+RENDER_SEGMENT_MIN_ANIMATIONS = int(os.getenv("RENDER_SEGMENT_MIN_ANIMATIONS", "4"))
+parallel_render_stats = {"renders": 0, "segments": 0, "fallbacks": 0, "seconds": 0.0}
+
+
+async def run_manim(
+    file_path: str,
+    scene_name: str = "Scene1",
+    timeout: int = MANIM_TIMEOUT,
+    priority: int = PRIORITY_GENERATE,
+    flags: Optional[List[str]] = None
+) -> subprocess.CompletedProcess:
+    """
+    Run manim on the render scheduler as an asyncio subprocess so the event loop stays free.
+    Mirrors subprocess.run(capture_output=True, text=True, timeout=...) and raises
+    subprocess.TimeoutExpired (after killing the process) when the timeout is hit.
+    The timeout only covers the render itself, not the time spent waiting in the queue.
+    `flags` defaults to MANIM_QUALITY_FLAGS.
+    """
+    args = ["manim", *(flags if flags is not None else MANIM_QUALITY_FLAGS), file_path, scene_name]
+
+    async def render() -> subprocess.CompletedProcess:
+        server = await asyncio.to_thread(manim_fork_server.get)
+        if server is not None:
+            start = time.perf_counter()
+            try:
+                result = await server.run(args[1:], timeout)
+            except (OSError, ValueError) as e:
+                print(f"⚠ Fork server render failed, falling back to a manim subprocess: {e}")
+            else:
+                render_backend_stats["fork_server"]["runs"] += 1
+                render_backend_stats["fork_server"]["seconds"] += time.perf_counter() - start
+                return result
+
+        start = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise subprocess.TimeoutExpired(args, timeout)
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+
+        render_backend_stats["subprocess"]["runs"] += 1
+        render_backend_stats["subprocess"]["seconds"] += time.perf_counter() - start
+        return subprocess.CompletedProcess(
+            args,
+            process.returncode,
+            stdout.decode("utf-8", errors="replace"),
+            stderr.decode("utf-8", errors="replace")
+        )
+
+    return await render_scheduler.submit(render, priority=priority)
+
+
+def find_rendered_video(module_name: str, scene_name: str, quality: str, media_dir: Path = Path("media")) -> Optional[Path]:
+    """
+    The video manim wrote for a scene: <media_dir>/videos/<module>/<quality dir>/<scene>.mp4, or
+    any quality directory if a manim.cfg changed the resolution or frame rate.
+    """
+    module_dir = Path(media_dir) / "videos" / module_name
+    expected = module_dir / QUALITY_TIERS[quality]["dir"] / f"{scene_name}.mp4"
+    if expected.exists():
+        return expected
+    candidates = sorted(module_dir.glob(f"*/{scene_name}.mp4"), key=lambda path: path.stat().st_mtime)
+    return candidates[-1] if candidates else None
+
+
+# Manim logs "Animation N : Using cached data (hash : ...)" for every partial movie it reuses
+_CACHED_ANIMATION_RE = re.compile(r"Using cached data")
+
+# Partial movie cache reuse across session re-renders
+partial_cache_stats = {"renders": 0, "animations": 0, "cached": 0}
+
+# One render at a time per session module (they share the module file and media directory).
+# Entries ({"lock", "users"}) only exist while a session has a render running or waiting.
+session_locks: Dict[str, dict] = {}
+
+
+def session_module_name(session_id: str) -> str:
+    """
+    Stable module name for an editor session or document, so every re-render writes to the same
+    media/videos/<module>/ directory and manim's partial movie cache can hit.
+    """
+    cleaned = re.sub(r"[^A-Za-z0-9_]", "_", session_id.strip())[:48]
+    if not cleaned.strip("_"):
+        raise ValueError("session_id must contain letters or digits")
+    # Cleaning is lossy ("a-b" and "a_b"), the hash of the raw id keeps sessions apart
+    digest = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:10]
+    return f"session_{cleaned}_{digest}"
+
+
+def partial_cache_usage(output: str) -> Optional[dict]:
+    """
+    How many of the rendered animations came from manim's partial movie cache.
+    """
+    animations = count_played_animations(output)
+    if animations is None:
+        return None
+    return {"animations": animations, "cached": len(_CACHED_ANIMATION_RE.findall(output))}
+
+
+def video_url_for(video_path: Path) -> Optional[str]:
+    """
+    GET URL of a delivered video (served with Range and ETag support by /videos).
+    """
+    try:
+        return f"/videos/{Path(video_path).resolve().relative_to(OUTPUT_DIR.resolve()).as_posix()}"
+    except ValueError:
+        return None
+
+
+def video_response(request: Request, video_path: Path, filename: str, headers: dict) -> Response:
+    """
+    Serve a video with a strong ETag: a matching If-None-Match gets 304 Not Modified, and
+    FileResponse answers Range requests with 206 Partial Content (or 416).
+    """
+    artifact_store.touch(video_path)
+    etag = video_etag(video_path)
+    headers = {**headers, "ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    video_url = video_url_for(video_path)
+    if video_url is not None:
+        headers["X-Video-Url"] = video_url
+    return FileResponse(
+        path=video_path,
+        media_type="video/mp4",
+        filename=filename,
+        headers=headers
+    )
+
+
+def code_file_path_for(video_path: Path) -> Path:
+    """
+    Path of the generated code file that belongs to a rendered video.
+    """
+    return OUTPUT_DIR / f"generated_code_{Path(video_path).stem.replace('animation_', '')}.py"
+
+
+async def dry_run_manim(file_path: str, scene_name: str, priority: int) -> Tuple[Optional[str], Optional[int]]:
+    """
+    Run the scene logic without rendering frames or encoding video.
+    Returns (error, animations): the error output if the scene crashed, None if it passed (or
+    the dry run timed out - a slow scene is not necessarily a broken one, the full render has
+    its own timeout), and the number of animations manim reported (None if unknown).
+    """
+    print(f"  Dry run: manim {' '.join(MANIM_DRY_RUN_FLAGS)} {file_path} {scene_name}")
+    start = time.perf_counter()
+    dry_run_stats["runs"] += 1
+    try:
+        result = await run_manim(file_path, scene_name, timeout=MANIM_DRY_RUN_TIMEOUT,
+                                 priority=priority, flags=MANIM_DRY_RUN_FLAGS)
+    except subprocess.TimeoutExpired:
+        dry_run_stats["timed_out"] += 1
+        print(f"  ⚠ Dry run timed out ({MANIM_DRY_RUN_TIMEOUT} seconds), continuing with the full render")
+        return None, None
+    finally:
+        dry_run_stats["seconds"] += time.perf_counter() - start
+
+    if result.returncode != 0:
+        dry_run_stats["failed"] += 1
+        print(f"✗ Dry run failed after {time.perf_counter() - start:.1f}s, skipping the full render")
+        return result.stderr.strip() or "Unknown execution error", None
+    print(f"  ✓ Dry run passed in {time.perf_counter() - start:.1f}s")
+    return None, count_played_animations(result.stdout + result.stderr)
+
+
+async def render_segments(
+    file_path: str,
+    scene_name: str,
+    quality: str,
+    ranges: List[Tuple[int, int]],
+    priority: int
+) -> Optional[subprocess.CompletedProcess]:
+    """
+    Render animation ranges of a scene concurrently, each into its own media directory, and
+    join them at the path a serial render writes to.
+    Returns the result of the first failed segment, a combined successful result, or None if
+    the segments could not be joined (the caller then renders serially).
+    """
+    tier = QUALITY_TIERS[quality]
+    module_name = Path(file_path).stem
+    segments_dir = Path("media/segments") / module_name
+    start = time.perf_counter()
+    print(f"  Rendering {len(ranges)} segments in parallel: {ranges}")
+
+    tasks = [
+        asyncio.ensure_future(run_manim(
+            file_path, scene_name, timeout=tier["timeout"], priority=priority,
+            flags=[tier["flag"], *segment_flags(first, last, segments_dir / str(i))]
+        ))
+        for i, (first, last) in enumerate(ranges)
+    ]
+    try:
+        results = await asyncio.gather(*tasks)
+        for result in results:
+            if result.returncode != 0:
+                return result
+
+        parts = [
+            find_rendered_video(module_name, scene_name, quality, media_dir=segments_dir / str(i))
+            for i in range(len(ranges))
+        ]
+        if any(part is None for part in parts):
+            print("⚠ Segment video missing, falling back to a serial render")
+            parallel_render_stats["fallbacks"] += 1
+            return None
+
+        output_path = Path("media/videos") / module_name / parts[0].parent.name / f"{scene_name}.mp4"
+        try:
+            await concat_videos(parts, output_path)
+        except (RuntimeError, OSError, subprocess.TimeoutExpired) as e:
+            print(f"⚠ Joining segments failed, falling back to a serial render: {e}")
+            parallel_render_stats["fallbacks"] += 1
+            return None
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        shutil.rmtree(segments_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - start
+    parallel_render_stats["renders"] += 1
+    parallel_render_stats["segments"] += len(ranges)
+    parallel_render_stats["seconds"] += elapsed
+    print(f"  ✓ {len(ranges)} segments rendered and joined in {elapsed:.1f}s")
+    return subprocess.CompletedProcess(
+        ["manim", tier["flag"], file_path, scene_name],
+        0,
+        "\n".join(result.stdout for result in results),
+        "\n".join(result.stderr for result in results)
+    )
+
+
+async def render_code(
+    code: str,
+    scene_name: str = "Scene1",
+    priority: int = PRIORITY_GENERATE,
+    dry_run: Optional[bool] = None,
+    quality: str = PREVIEW_QUALITY,
+    parallel: Optional[bool] = None,
+    module_name: Optional[str] = None
+) -> dict:
+    """
+    Render Manim code into OUTPUT_DIR at a quality tier, going through the render cache first.
+    With dry_run (default: RENDER_DRY_RUN) the scene is dry-run before the full render.
+    With parallel (default: RENDER_PARALLEL) scenes with enough animations are rendered in
+    segments on several workers; this always dry-runs first to count the animations.
+    With module_name (see session_module_name) the code is written to <module_name>.py instead of
+    a fresh temp module, so unchanged animations reuse manim's cached partial movie files.
+
+    Returns a dict with:
+        video_path: Rendered (or cached) video, None on failure
+        code_path: Saved copy of the code that belongs to the video
+        error: Error message, None on success
+        temp_file_path: Temp module kept on failure for debugging
+        cache_hit: Whether the video came from the render cache
+        quality: Quality tier of the video
+        partial_cache: {"animations", "cached"} reuse of manim's partial movies, None if unknown
+    """
+    tier = QUALITY_TIERS[quality]
+    flags = [tier["flag"]]
+    cache_key = None
+    if render_cache is not None:
+        cache_key = render_cache.make_key(code, scene_name, flags)
+        cached_video = await asyncio.to_thread(render_cache.get, cache_key)
+        if cached_video is not None:
+            code_path = code_file_path_for(cached_video)
+            if not code_path.exists():
+                code_path.write_text(code, encoding="utf-8")
+            artifact_store.add(cache_key, [code_path])
+            render_id = artifact_index.start(cache_key, code, scene_name, quality, str(code_path),
+                                             cache_key=cache_key, **render_origin.get())
+            artifact_index.finish(render_id, ARTIFACT_SUCCEEDED, video_path=str(cached_video), cache_hit=True)
+            print(f"✓ Render cache hit: {cached_video}")
+            return {
+                "video_path": str(cached_video),
+                "code_path": str(code_path),
+                "error": None,
+                "temp_file_path": None,
+                "cache_hit": True,
+                "quality": quality,
+                "partial_cache": None
+            }
+
+    if module_name is not None:
+        # Renders of the same session must not overwrite each other's module file
+        entry = session_locks.setdefault(module_name, {"lock": asyncio.Lock(), "users": 0})
+        entry["users"] += 1
+        try:
+            async with entry["lock"]:
+                return await _render_module(code, scene_name, priority, dry_run, quality, parallel,
+                                            cache_key, open(f"{module_name}.py", 'w', encoding='utf-8'),
+                                            keep_media=True)
+        finally:
+            # Forget the lock once nobody holds or waits for it
+            entry["users"] -= 1
+            if entry["users"] == 0:
+                del session_locks[module_name]
+
+    # Create temporary Python file
+    temp_file = tempfile.NamedTemporaryFile(
+        mode='w',
+        suffix='.py',
+        delete=False,
+        dir='.',
+        encoding='utf-8'
+    )
+    return await _render_module(code, scene_name, priority, dry_run, quality, parallel, cache_key, temp_file)
+
+
+async def _render_module(
+    code: str,
+    scene_name: str,
+    priority: int,
+    dry_run: Optional[bool],
+    quality: str,
+    parallel: Optional[bool],
+    cache_key: Optional[str],
+    temp_file,
+    keep_media: bool = False
+) -> dict:
+    """
+    Write the code to the open module file `temp_file` and render it (see render_code).
+    Manim's intermediate output is removed after a successful render unless keep_media is set
+    (session modules, whose partial movie files are reused).
+    """
+    tier = QUALITY_TIERS[quality]
+    flags = [tier["flag"]]
+    temp_file_path = temp_file.name
+    temp_filename = Path(temp_file_path).stem
+    code_output_path = OUTPUT_DIR / f"generated_code_{temp_filename}.py"
+    start = time.perf_counter()
+    # Artifact index row of this render (session modules render many times under one name)
+    render_id = None
+
+    def failure(error_msg: str) -> dict:
+        artifact_index.finish(render_id, ARTIFACT_FAILED, error=error_msg[-2000:],
+                              render_seconds=time.perf_counter() - start)
+        return {
+            "video_path": None,
+            "code_path": str(code_output_path),
+            "error": error_msg,
+            "temp_file_path": temp_file_path,
+            "cache_hit": False,
+            "quality": quality,
+            "partial_cache": None
+        }
+
+    artifact_store.begin_render(temp_filename)
+    try:
+        # Write code to temp file
+        temp_file.write(code)
+        temp_file.close()
+
+        print(f"  Created temp file: {temp_file_path}")
+
+        # Save the code to a permanent file as well
+        with open(code_output_path, 'w', encoding='utf-8') as f:
+            f.write(code)
+        print(f"  Saved code to: {code_output_path}")
+        artifact_store.add(temp_filename, [code_output_path])
+        render_id = artifact_index.start(temp_filename, code, scene_name, quality, str(code_output_path),
+                                         cache_key=cache_key, **render_origin.get())
+
+        if dry_run is None:
+            dry_run = RENDER_DRY_RUN
+        if parallel is None:
+            parallel = RENDER_PARALLEL
+        animations = None
+        if dry_run or parallel:
+            dry_run_error, animations = await dry_run_manim(temp_file_path, scene_name, priority)
+            if dry_run_error is not None:
+                print(dry_run_error)
+                return failure(dry_run_error)
+
+        # Execute Manim - in segments when the scene is long enough and ffmpeg is available
+        result = None
+        if parallel and animations and supports_segments(code) and shutil.which("ffmpeg"):
+            ranges = plan_segments(animations, RENDER_SEGMENTS or render_scheduler.workers, RENDER_SEGMENT_MIN_ANIMATIONS)
+            if len(ranges) > 1:
+                result = await render_segments(temp_file_path, scene_name, quality, ranges, priority)
+        if result is None:
+            print(f"  Running: manim {' '.join(flags)} {temp_file_path} {scene_name}")
+            result = await run_manim(temp_file_path, scene_name, timeout=tier["timeout"], priority=priority, flags=flags)
+
+        if result.returncode != 0:
+            error_msg = result.stderr.strip() or "Unknown execution error"
+            print(f"✗ Manim execution failed:")
+            print(result.stderr)
+            return failure(error_msg)
+
+        # Manim outputs to media/videos/{filename}/{quality dir, e.g. 480p15}/{scene_name}.mp4
+        expected_video_path = find_rendered_video(temp_filename, scene_name, quality)
+
+        if expected_video_path is None:
+            error_msg = f"Video file not found under: {Path('media/videos') / temp_filename}"
+            print(f"✗ {error_msg}")
+            return failure(error_msg)
+
+        # Move the video to the output directory (rewritten once if it is not faststart)
+        final_video_path = OUTPUT_DIR / f"animation_{temp_filename}.mp4"
+        if deliver_video(expected_video_path, final_video_path, faststart=VIDEO_FASTSTART):
+            print("  Moved moov atom to the front (faststart)")
+        print(f"✓ Video generated successfully: {final_video_path}")
+        artifact_store.add(temp_filename, [code_output_path, final_video_path])
+
+        partial_cache = partial_cache_usage(result.stdout + result.stderr)
+        if partial_cache is not None:
+            partial_cache_stats["renders"] += 1
+            partial_cache_stats["animations"] += partial_cache["animations"]
+            partial_cache_stats["cached"] += partial_cache["cached"]
+            print(f"  Partial movie cache: {partial_cache['cached']}/{partial_cache['animations']} animations reused")
+
+        if cache_key is not None:
+            await asyncio.to_thread(render_cache.put, cache_key, final_video_path)
+
+        # Clean up temp file and manim's partial movie files
+        try:
+            os.remove(temp_file_path)
+        except OSError:
+            pass
+        if not keep_media:
+            artifact_store.cleanup_intermediates(temp_filename)
+
+        artifact_index.finish(render_id, ARTIFACT_SUCCEEDED, video_path=str(final_video_path),
+                              render_seconds=time.perf_counter() - start)
+        return {
+            "video_path": str(final_video_path),
+            "code_path": str(code_output_path),
+            "error": None,
+            "temp_file_path": None,
+            "cache_hit": False,
+            "quality": quality,
+            "partial_cache": partial_cache
+        }
+
+    except subprocess.TimeoutExpired:
+        error_msg = f"Manim execution timed out ({tier['timeout']} seconds)"
+        print(f"✗ {error_msg}")
+        return failure(error_msg)
+
+    except asyncio.CancelledError:
+        # Abandoned render (e.g. another fix candidate won) - leave nothing behind
+        try:
+            os.remove(temp_file_path)
+        except OSError:
+            pass
+        # Session modules keep their code file and media for the next re-render
+        if not keep_media:
+            artifact_store.discard(code_output_path)
+            artifact_store.cleanup_intermediates(temp_filename)
+        artifact_index.finish(render_id, ARTIFACT_CANCELLED, render_seconds=time.perf_counter() - start)
+        raise
+
+    except Exception as e:
+        error_msg = f"Unexpected error during execution: {str(e)}"
+        print(f"✗ {error_msg}")
+        return failure(error_msg)
+
+    finally:
+        artifact_store.end_render(temp_filename)
+
+
 # Pydantic models for API
 class QueryRequest(BaseModel):
     query: str
+    upgrade_quality: Optional[str] = None  # None: UPGRADE_QUALITY, "none": no background upgrade
 
 # LangGraph State definition
 class State(TypedDict):
@@ -113,17 +1042,23 @@ class State(TypedDict):
     story: str
     syntax_questions: List[str]
     rag_responses: List[str]
+    rag_documents: List[dict]
+    speculative_queries: List[str]
+    speculative_documents: List[dict]
+    retrieval_queries: List[str]
     code: str
+    code_issue: Optional[str]
     video_path: Optional[str]
     error: Optional[str]
     attempt_count: int
     temp_file_path: Optional[str]
+    code_cache_key: Optional[str]
 
 
 # ============================================================================
 # NODE 1: Generate Story
 # ============================================================================
-def generate_story(state: State) -> dict:
+async def generate_story(state: State) -> dict:
     """
     Generate an educational story/narrative for the animation based on user query.
     The story should describe how to visually demonstrate the concept using Manim.
@@ -138,8 +1073,8 @@ def generate_story(state: State) -> dict:
     ]
     
     try:
-        response = llm_fast.invoke(messages)  # Use fast model for story
-        story = response.content.strip()
+        response = await invoke_llm("generate_story", llm_fast.get(), messages)  # Use fast model for story
+        story = response.strip()
         print(f"✓ Story generated: {story[:100]}...")
         return {"story": story}
     except Exception as e:
@@ -150,7 +1085,27 @@ def generate_story(state: State) -> dict:
 # ============================================================================
 # NODE 2: Generate Syntax Questions
 # ============================================================================
-def generate_syntax_questions(state: State) -> dict:
+# Padding used when the LLM returns fewer than 5 questions
+DEFAULT_SYNTAX_QUESTIONS = [
+    "How to create basic shapes in Manim?",
+    "How to animate objects in Manim?",
+    "How to use colors in Manim?",
+    "How to position objects using shift, move_to, next_to, to_edge in Manim?",
+    "How to use FadeOut and remove objects from scene in Manim?",
+    "How to use VGroup to organize multiple objects in Manim?"
+]
+
+
+def complete_syntax_questions(questions: List[str]) -> List[str]:
+    """
+    Ensure we have 5-6 questions with positioning and cleanup.
+    """
+    if len(questions) < 5:
+        questions = questions + DEFAULT_SYNTAX_QUESTIONS
+    return questions[:6]  # Limit to 6 questions
+
+
+async def generate_syntax_questions(state: State) -> dict:
     """
     Generate 4-5 specific syntax questions about Manim implementation
     that can be answered by RAG search of documentation.
@@ -165,8 +1120,8 @@ def generate_syntax_questions(state: State) -> dict:
     ]
     
     try:
-        response = llm_fast.invoke(messages)  # Use fast model for questions
-        questions_text = response.content.strip()
+        response = await invoke_llm("generate_syntax_questions", llm_fast.get(), messages)  # Use fast model for questions
+        questions_text = response.strip()
         
         # Parse questions into list
         questions = []
@@ -178,18 +1133,7 @@ def generate_syntax_questions(state: State) -> dict:
                 if question:
                     questions.append(question)
         
-        # Ensure we have 5-6 questions with positioning and cleanup
-        if len(questions) < 5:
-            questions.extend([
-                "How to create basic shapes in Manim?",
-                "How to animate objects in Manim?",
-                "How to use colors in Manim?",
-                "How to position objects using shift, move_to, next_to, to_edge in Manim?",
-                "How to use FadeOut and remove objects from scene in Manim?",
-                "How to use VGroup to organize multiple objects in Manim?"
-            ])
-        
-        questions = questions[:6]  # Limit to 6 questions
+        questions = complete_syntax_questions(questions)
         
         print(f"✓ Generated {len(questions)} syntax questions")
         for i, q in enumerate(questions, 1):
@@ -206,55 +1150,184 @@ def generate_syntax_questions(state: State) -> dict:
         }
 
 
+# ============================================================================
+# NODE 1+2 (fused planner mode): Story and Syntax Questions in one call
+# ============================================================================
+class AnimationPlan(BaseModel):
+    story: str
+    questions: List[str]
+
+
+def parse_animation_plan(text: str) -> AnimationPlan:
+    """
+    Parse the planner's JSON answer (tolerating a surrounding markdown fence).
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    return AnimationPlan.model_validate_json(text)
+
+
+async def plan_animation(state: State) -> dict:
+    """
+    Generate the story and the syntax questions with a single structured (JSON) LLM call.
+    Replaces generate_story + generate_syntax_questions when PLANNER_MODE=fused.
+    """
+    print("\n[Node 1+2] Planning story and syntax questions...")
+    
+    messages = [
+        SystemMessage(content=PLANNING_PROMPT),
+        HumanMessage(content=f"User query: {state['query']}")
+    ]
+    
+    try:
+        response = await invoke_llm("plan_animation", llm_plan.get(), messages)
+        plan = parse_animation_plan(response)
+        story = plan.story.strip()
+        questions = complete_syntax_questions([q.strip() for q in plan.questions if q.strip()])
+        
+        print(f"✓ Story generated: {story[:100]}...")
+        print(f"✓ Generated {len(questions)} syntax questions")
+        for i, q in enumerate(questions, 1):
+            print(f"  {i}. {q}")
+        
+        return {"story": story, "syntax_questions": questions}
+    
+    except Exception as e:
+        print(f"✗ Error planning animation: {e}")
+        return {
+            "story": f"Simple animation for: {state['query']}",
+            "syntax_questions": FALLBACK_SYNTAX_QUESTIONS,
+            "error": str(e)
+        }
+
+
+# ============================================================================
+# NODE 3a: Speculative RAG Search
+# ============================================================================
+async def search_documentation(queries: List[str], k: int = 2) -> Optional[List[List[Document]]]:
+    """
+    Top-k documentation chunks for each query, or None when no vector store is available.
+    """
+    store = await asyncio.to_thread(vectorstore.get)
+    if not store:
+        return None
+
+    # Embed all queries in one batch and look them up in a single query
+    bm25 = await asyncio.to_thread(lexical_index.get)
+    if bm25 is not None:
+        # Fuse with BM25 so exact API names (next_to, VGroup, ...) are not missed
+        return await asyncio.to_thread(hybrid_search, store, embeddings.get(), bm25, queries, k)
+    return await asyncio.to_thread(batch_similarity_search, store, embeddings.get(), queries, k)
+
+
+async def speculative_rag(state: State) -> dict:
+    """
+    Retrieve documentation for the raw user query and for API names extracted from it locally.
+    Runs in parallel with the planner (SPECULATIVE_RETRIEVAL=true); rag_search merges the results.
+    """
+    print("\n[Node 3a] Speculative RAG search on the user query...")
+
+    queries = [state["query"]] + extract_api_queries(state["query"])
+    try:
+        results_per_query = await search_documentation(queries, 2)
+    except Exception as e:
+        print(f"    ✗ Speculative search failed: {e}")
+        return {"speculative_queries": [], "speculative_documents": []}
+
+    if results_per_query is None:
+        print("⚠ ChromaDB not available, skipping speculative search")
+        return {"speculative_queries": [], "speculative_documents": []}
+
+    speculative_documents = [
+        {"query_index": i, "rank": rank, "text": doc.page_content}
+        for i, results in enumerate(results_per_query)
+        for rank, doc in enumerate(results, 1)
+    ]
+    print(f"✓ Speculative search found {len(speculative_documents)} docs for {len(queries)} queries")
+    return {"speculative_queries": queries, "speculative_documents": speculative_documents}
+
+
 # ============================================================================
 # NODE 3: RAG Search
 # ============================================================================
-def rag_search(state: State) -> dict:
+async def rag_search(state: State) -> dict:
     """
     Search ChromaDB documentation for answers to syntax questions.
     Returns relevant documentation snippets for each question.
+    Chunks already found by speculative_rag are kept; questions only add what is missing.
     """
     print("\n[Node 3] Performing RAG search...")
     
-    if not vectorstore:
+    speculative_queries = state.get("speculative_queries") or []
+    speculative_documents = state.get("speculative_documents") or []
+    already_found = {doc["text"] for doc in speculative_documents}
+
+    # Questions identical to a speculative query were answered already
+    asked = {query.strip().lower() for query in speculative_queries}
+    syntax_questions = [q for q in state.get("syntax_questions", []) if q.strip().lower() not in asked]
+
+    # Questions are Q1..Qn, speculative queries follow them
+    retrieval_queries = syntax_questions + speculative_queries
+    rag_documents = [
+        {"question_index": len(syntax_questions) + doc["query_index"] + 1, "rank": doc["rank"], "text": doc["text"]}
+        for doc in speculative_documents
+    ]
+    rag_responses = []
+    
+    try:
+        # Search for top 2 most relevant documents for each question
+        results_per_question = await search_documentation(syntax_questions, 2)
+    except Exception as e:
+        print(f"    ✗ Error searching: {e}")
+        return {
+            "rag_responses": [
+                f"Q{i}: {question}\nSearch error: {str(e)}"
+                for i, question in enumerate(syntax_questions, 1)
+            ],
+            "rag_documents": rag_documents,
+            "retrieval_queries": retrieval_queries
+        }
+
+    if results_per_question is None:
         print("⚠ ChromaDB not available, skipping RAG search")
         return {
             "rag_responses": ["ChromaDB not available - using general Manim knowledge"]
         }
     
-    syntax_questions = state.get("syntax_questions", [])
-    rag_responses = []
-    
-    for i, question in enumerate(syntax_questions, 1):
-        print(f"  Searching for: {question}")
-        try:
-            # Search for top 2 most relevant documents for each question
-            results = vectorstore.similarity_search(question, k=2)
-            
-            if results:
-                # Combine results for this question
-                answer = f"Q{i}: {question}\n"
-                for j, doc in enumerate(results, 1):
-                    answer += f"Answer {j}: {doc.page_content[:450]}...\n"
+    for i, (question, results) in enumerate(zip(syntax_questions, results_per_question), 1):
+        print(f"  Searched for: {question}")
+        new_results = [doc for doc in results if doc.page_content not in already_found]
+        # Full chunks for the context packer used by generate_code
+        rag_documents.extend(
+            {"question_index": i, "rank": rank, "text": doc.page_content}
+            for rank, doc in enumerate(results, 1)
+        )
+        if results:
+            # Combine results for this question
+            answer = f"Q{i}: {question}\n"
+            for j, doc in enumerate(results, 1):
+                answer += f"Answer {j}: {doc.page_content[:450]}...\n"
 
-                rag_responses.append(answer)
-                print(f"    ✓ Found {len(results)} relevant docs")
+            rag_responses.append(answer)
+            if speculative_documents:
+                print(f"    ✓ Found {len(results)} relevant docs ({len(new_results)} not found speculatively)")
             else:
-                rag_responses.append(f"Q{i}: {question}\nNo specific documentation found.")
-                print(f"    ⚠ No results found")
-                
-        except Exception as e:
-            print(f"    ✗ Error searching: {e}")
-            rag_responses.append(f"Q{i}: {question}\nSearch error: {str(e)}")
+                print(f"    ✓ Found {len(results)} relevant docs")
+        else:
+            rag_responses.append(f"Q{i}: {question}\nNo specific documentation found.")
+            print(f"    ⚠ No results found")
     
     print(f"✓ RAG search completed with {len(rag_responses)} responses")
-    return {"rag_responses": rag_responses}
+    return {"rag_responses": rag_responses, "rag_documents": rag_documents, "retrieval_queries": retrieval_queries}
 
 
 # ============================================================================
 # NODE 4: Generate Code
 # ============================================================================
-def generate_code(state: State) -> dict:
+async def generate_code(state: State) -> dict:
     """
     Generate complete Manim code using the story, syntax questions, and RAG responses.
     """
@@ -262,6 +1335,18 @@ def generate_code(state: State) -> dict:
     
     system_message = SystemMessage(content=CODE_GENERATION_PROMPT)
 
+    # Pack retrieved docs: deduplicated, overlapping chunks merged, most relevant first, within budget
+    rag_documents = state.get("rag_documents") or []
+    if rag_documents:
+        queries = state.get("retrieval_queries") or state.get("syntax_questions", [])
+        questions = "\n".join(f"Q{i}: {q}" for i, q in enumerate(queries, 1))
+        packed, pack_stats = pack_context(rag_documents, RAG_CONTEXT_TOKEN_BUDGET)
+        documentation = f"{questions}\n\n{packed}"
+        print(f"  Packed RAG context: {pack_stats['chunks_packed']}/{pack_stats['chunks_retrieved']} chunks, "
+              f"~{pack_stats['tokens_after']} tokens (saved ~{pack_stats['tokens_saved']})")
+    else:
+        documentation = chr(10).join(state.get('rag_responses', []))
+
     # Build comprehensive context for code generation
     user_content = f"""
 USER QUERY: {state['query']}
@@ -270,38 +1355,30 @@ STORY/NARRATIVE TO ANIMATE:
 {state['story']}
 
 SYNTAX DOCUMENTATION (from RAG search):
-{chr(10).join(state.get('rag_responses', []))}
+{documentation}
 
 Generate the complete, executable Manim code following the template structure.
 Make sure the animation clearly demonstrates the concept from the story.
 """
 
-    messages = [system_message, HumanMessage(content=user_content)]
-    
     try:
-        response = llm_code.invoke(messages)  # Use better model for code generation
-        code_content = response.content.strip()
-        
-        # Clean up markdown formatting
-        if code_content.startswith("```python"):
-            code_content = code_content[9:]
-        elif code_content.startswith("```"):
-            code_content = code_content[3:]
-        
-        if code_content.endswith("```"):
-            code_content = code_content[:-3]
-        
-        code_content = code_content.strip()
+        # Use better model for code generation; fences are stripped while streaming
+        code_content, problem, messages = await stream_code_with_retry("generate_code", system_message, user_content)
         
         # Ensure proper imports exist
         if "from manim import" not in code_content:
             code_content = "from manim import *\nfrom math import *\n\n" + code_content
         
+        if problem is not None:
+            # Skip the render - send the code straight to review_code
+            print(f"✗ Generated code is unusable: {problem}")
+            return {"code": code_content, "error": problem, "code_issue": problem, "code_cache_key": None}
+        
         print(f"✓ Code generated ({len(code_content)} characters)")
         print("Code preview:")
         print(code_content[:200] + "...\n")
         
-        return {"code": code_content}
+        return {"code": code_content, "code_cache_key": llm_cache_key(llm_code.get(), messages)}
     
     except Exception as e:
         print(f"✗ Error generating code: {e}")
@@ -318,10 +1395,33 @@ class Scene1(Scene):
         return {"code": fallback_code, "error": str(e)}
 
 
+# ============================================================================
+# NODE 4b: Pre-flight Check
+# ============================================================================
+async def validate_code(state: State) -> dict:
+    """
+    Statically check the generated code against the manim API index. Undefined names,
+    unknown methods and unexpected keyword arguments go to review_code without a render.
+    """
+    if state.get("code_issue"):
+        return {}
+    print("\n[Node 4b] Pre-flight checking code...")
+
+    issues = await asyncio.to_thread(preflight_issues, state.get("code", ""))
+    if not issues:
+        print("✓ Pre-flight check passed")
+        return {}
+
+    for issue in issues:
+        print(f"    ✗ {issue}")
+    problem = "Pre-flight check failed:\n" + "\n".join(issues)
+    return {"error": problem, "code_issue": problem}
+
+
 # ============================================================================
 # NODE 5: Execute Manim
 # ============================================================================
-def execute_manim(state: State) -> dict:
+async def execute_manim(state: State) -> dict:
     """
     Execute the generated Manim code and save the video output.
     """
@@ -333,106 +1433,22 @@ def execute_manim(state: State) -> dict:
         print(f"✗ {error_msg}")
         return {"error": error_msg}
     
-    # Create temporary Python file
-    temp_file = tempfile.NamedTemporaryFile(
-        mode='w',
-        suffix='.py',
-        delete=False,
-        dir='.',
-        encoding='utf-8'
-    )
-    
-    try:
-        # Write code to temp file
-        temp_file.write(code)
-        temp_file.close()
-        temp_file_path = temp_file.name
-        
-        print(f"  Created temp file: {temp_file_path}")
-        
-        # Save the code to a permanent file as well
-        code_output_path = OUTPUT_DIR / f"generated_code_{Path(temp_file_path).stem}.py"
-        with open(code_output_path, 'w', encoding='utf-8') as f:
-            f.write(code)
-        print(f"  Saved code to: {code_output_path}")
-        
-        # Execute Manim
-        print(f"  Running: manim -ql {temp_file_path} Scene1")
-        result = subprocess.run(
-            ["manim", "-ql", temp_file_path, "Scene1"],
-            capture_output=True,
-            text=True,
-            timeout=120  # 2 minutes timeout
-        )
-        
-        if result.returncode != 0:
-            error_msg = result.stderr.strip() or "Unknown execution error"
-            print(f"✗ Manim execution failed:")
-            print(result.stderr)
-            return {
-                "error": error_msg,
-                "temp_file_path": temp_file_path
-            }
-        
-        # Find the generated video
-        # Manim outputs to media/videos/{filename}/480p15/Scene1.mp4
-        video_pattern = Path("media/videos")
-        
-        # Search for the generated video
-        temp_filename = Path(temp_file_path).stem
-        expected_video_dir = video_pattern / temp_filename / "480p15"
-        expected_video_path = expected_video_dir / "Scene1.mp4"
-        
-        if expected_video_path.exists():
-            # Copy video to output directory
-            final_video_path = OUTPUT_DIR / f"animation_{temp_filename}.mp4"
-            shutil.copy2(expected_video_path, final_video_path)
-            
-            print(f"✓ Video generated successfully: {final_video_path}")
-            
-            # Clean up temp file
-            try:
-                os.remove(temp_file_path)
-            except:
-                pass
-            
-            return {
-                "video_path": str(final_video_path),
-                "error": None,
-                "temp_file_path": None
-            }
-        else:
-            error_msg = f"Video file not found at expected path: {expected_video_path}"
-            print(f"✗ {error_msg}")
-            return {
-                "error": error_msg,
-                "temp_file_path": temp_file_path
-            }
-    
-    except subprocess.TimeoutExpired:
-        error_msg = "Manim execution timed out (120 seconds)"
-        print(f"✗ {error_msg}")
-        return {
-            "error": error_msg,
-            "temp_file_path": temp_file.name
-        }
-    
-    except Exception as e:
-        error_msg = f"Unexpected error during execution: {str(e)}"
-        print(f"✗ {error_msg}")
-        return {
-            "error": error_msg,
-            "temp_file_path": temp_file.name if 'temp_file' in locals() else None
-        }
+    result = await render_code(code, "Scene1")
+    return {
+        "video_path": result["video_path"],
+        "error": result["error"],
+        "temp_file_path": result["temp_file_path"]
+    }
 
 
 # ============================================================================
 # NODE 6: Review and Fix Code
 # ============================================================================
-def review_code(state: State) -> dict:
+async def review_code(state: State) -> dict:
     """
-    Review the failed code, fix it using LLM with error context, and execute once.
-    This node only runs when execute_manim encounters an error.
+    Review the failed code and fix it using LLM with error context: FIX_CANDIDATES fixes are
+    requested, checked and rendered in parallel and the first one that renders wins.
+    This node only runs when execute_manim (or a pre-render check) finds an error.
     """
     print("\n[Node 6] Reviewing and fixing code...")
     
@@ -445,6 +1461,32 @@ def review_code(state: State) -> dict:
     
     print(f"  Error to fix: {error_message[:200]}...")
     
+    # The cached generation produced broken code - don't serve it again
+    if llm_cache is not None and state.get("code_cache_key"):
+        await asyncio.to_thread(llm_cache.delete, state["code_cache_key"])
+    
+    # Known errors: patch and re-render without an LLM call (a patch may expose the next error)
+    for _ in range(FIX_CACHE_MAX_ROUNDS if fix_cache is not None else 0):
+        patch = await asyncio.to_thread(fix_cache.lookup, error_message, current_code)
+        if patch is None:
+            break
+        print(f"  ✓ Fix cache hit ({', '.join(source['name'] for source in patch['sources'])}), "
+              f"rendering patched code without an LLM call...")
+        result = await render_code(patch["code"], "Scene1")
+        remaining = {signature["key"] for signature in error_signatures(result["error"] or "")}
+        await asyncio.to_thread(fix_cache.record, patch, success=not remaining & set(patch["signatures"]))
+        if result["error"] is None:
+            print(f"✓ Patched code executed successfully! Video: {result['video_path']}")
+            return {
+                "code": patch["code"],
+                "video_path": result["video_path"],
+                "error": None,
+                "code_issue": None,
+                "temp_file_path": None
+            }
+        print(f"  ✗ Patched code failed: {result['error'][-200:]}")
+        current_code, error_message = patch["code"], result["error"]
+
     system_message = SystemMessage(content=CODE_FIXING_PROMPT)
 
     user_content = f"""CURRENT CODE (WITH ERROR):
@@ -453,139 +1495,141 @@ def review_code(state: State) -> dict:
 ERROR MESSAGE:
 {error_message}
 
-Fix the code to resolve this error. Return the complete corrected code.
-"""
-
-    messages = [system_message, HumanMessage(content=user_content)]
-    
-    try:
-        response = llm_code.invoke(messages)  # Use better model for code fixing
-        fixed_code = response.content.strip()
-        
-        # Clean up markdown formatting
-        if fixed_code.startswith("```python"):
-            fixed_code = fixed_code[9:]
-        elif fixed_code.startswith("```"):
-            fixed_code = fixed_code[3:]
-        
-        if fixed_code.endswith("```"):
-            fixed_code = fixed_code[:-3]
-        
-        fixed_code = fixed_code.strip()
-        
-        # Ensure proper imports
-        if "from manim import" not in fixed_code:
-            fixed_code = "from manim import *\nfrom math import *\n\n" + fixed_code
-        
-        print(f"✓ Code fixed ({len(fixed_code)} characters)")
-        print("Fixed code preview:")
-        print(fixed_code[:200] + "...\n")
-        
-        # Now execute the fixed code (ONE TIME ONLY)
-        print("  Executing fixed code...")
-        
-        # Create temporary Python file
-        temp_file = tempfile.NamedTemporaryFile(
-            mode='w',
-            suffix='.py',
-            delete=False,
-            dir='.',
-            encoding='utf-8'
-        )
-        
-        try:
-            temp_file.write(fixed_code)
-            temp_file.close()
-            temp_file_path = temp_file.name
-            
-            print(f"  Created temp file: {temp_file_path}")
-            
-            # Save the fixed code
-            code_output_path = OUTPUT_DIR / f"generated_code_{Path(temp_file_path).stem}.py"
-            with open(code_output_path, 'w', encoding='utf-8') as f:
-                f.write(fixed_code)
-            print(f"  Saved fixed code to: {code_output_path}")
-            
-            # Execute Manim
-            print(f"  Running: manim -ql {temp_file_path} Scene1")
-            result = subprocess.run(
-                ["manim", "-ql", temp_file_path, "Scene1"],
-                capture_output=True,
-                text=True,
-                timeout=120
-            )
-            
-            if result.returncode != 0:
-                error_msg = result.stderr.strip() or "Unknown execution error after fix"
-                print(f"✗ Fixed code still failed:")
-                print(result.stderr)
-                return {
-                    "code": fixed_code,
-                    "error": f"Fix attempt failed: {error_msg}",
-                    "temp_file_path": temp_file_path
-                }
-            
-            # Find the generated video
-            video_pattern = Path("media/videos")
-            temp_filename = Path(temp_file_path).stem
-            expected_video_dir = video_pattern / temp_filename / "480p15"
-            expected_video_path = expected_video_dir / "Scene1.mp4"
-            
-            if expected_video_path.exists():
-                final_video_path = OUTPUT_DIR / f"animation_{temp_filename}.mp4"
-                shutil.copy2(expected_video_path, final_video_path)
-                
-                print(f"✓ Fixed code executed successfully! Video: {final_video_path}")
-                
-                # Clean up temp file
-                try:
-                    os.remove(temp_file_path)
-                except:
-                    pass
-                
-                return {
-                    "code": fixed_code,
-                    "video_path": str(final_video_path),
-                    "error": None,
-                    "temp_file_path": None
-                }
-            else:
-                error_msg = f"Video file not found at expected path: {expected_video_path}"
-                print(f"✗ {error_msg}")
-                return {
-                    "code": fixed_code,
-                    "error": error_msg,
-                    "temp_file_path": temp_file_path
-                }
-        
-        except subprocess.TimeoutExpired:
-            error_msg = "Fixed code execution timed out (120 seconds)"
-            print(f"✗ {error_msg}")
-            return {
-                "code": fixed_code,
-                "error": error_msg,
-                "temp_file_path": temp_file.name
-            }
-        
-        except Exception as e:
-            error_msg = f"Unexpected error during fixed code execution: {str(e)}"
-            print(f"✗ {error_msg}")
-            return {
-                "code": fixed_code,
-                "error": error_msg,
-                "temp_file_path": temp_file.name if 'temp_file' in locals() else None
-            }
-    
-    except Exception as e:
-        print(f"✗ Error fixing code: {e}")
+Fix the code to resolve this error. Return the complete corrected code.
+"""
+
+    temperatures = fix_temperatures()
+    print(f"  Requesting {len(temperatures)} fix candidate(s) at temperatures {temperatures} (deadline {FIX_DEADLINE}s)")
+    tasks = [
+        asyncio.create_task(fix_candidate(i, temperature, system_message, user_content))
+        for i, temperature in enumerate(temperatures, 1)
+    ]
+
+    # First candidate that renders wins; the rest (LLM streams and renders) are cancelled
+    deadline = time.perf_counter() + FIX_DEADLINE
+    pending = set(tasks)
+    winner = None
+    try:
+        while pending and winner is None:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None and task.result()["error"] is None:
+                    winner = task.result()
+                    break
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    if winner is not None:
+        print(f"✓ Fixed code executed successfully! Video: {winner['video_path']}")
+        if fix_cache is not None:
+            learned = await asyncio.to_thread(fix_cache.learn, error_message, current_code, winner["code"])
+            if learned:
+                print(f"  ✓ Learned {learned} fix(es) for the fix cache")
         return {
-            "error": f"Failed to fix code: {str(e)}"
+            "code": winner["code"],
+            "video_path": winner["video_path"],
+            "error": None,
+            "code_issue": None,
+            "temp_file_path": None
         }
 
+    # Report the first candidate that got far enough to fail (lowest temperature first)
+    finished = [task.result() for task in tasks if task.done() and not task.cancelled() and task.exception() is None]
+    if not finished:
+        failures = [task.exception() for task in tasks if task.done() and not task.cancelled() and task.exception()]
+        if failures:
+            print(f"✗ Error fixing code: {failures[0]}")
+            return {"error": f"Failed to fix code: {failures[0]}"}
+        print(f"✗ No fix candidate finished within {FIX_DEADLINE}s")
+        return {"error": f"Fix attempt failed: no candidate finished within {FIX_DEADLINE} seconds"}
+
+    print(f"✗ All {len(finished)} finished fix candidate(s) failed")
+    result = finished[0]
+    return {
+        "code": result["code"],
+        "error": f"Fix attempt failed: {result['error']}",
+        "code_issue": result["code_issue"],
+        "temp_file_path": result["temp_file_path"]
+    }
+
+
+async def fix_candidate(index: int, temperature: float, system_message: SystemMessage, user_content: str) -> dict:
+    """
+    One fix candidate: stream a fix at `temperature`, pre-flight check it and render it.
+    Returns {"code", "video_path", "error", "code_issue", "temp_file_path"}; error is None on success.
+    """
+    label = f"candidate {index} (t={temperature})"
+    llm = fix_llm(temperature)
+    fixed_code, problem, messages = await stream_code_with_retry("review_code", system_message, user_content, llm)
+    
+    # Ensure proper imports
+    if "from manim import" not in fixed_code:
+        fixed_code = "from manim import *\nfrom math import *\n\n" + fixed_code
+    
+    if problem is not None:
+        # Rendering code that can't run would only waste the render slot
+        print(f"  ✗ {label}: fixed code is unusable: {problem}")
+        return {"code": fixed_code, "video_path": None, "error": problem, "code_issue": problem, "temp_file_path": None}
+    
+    # A fix that still fails the pre-flight check gets one more (cheap) LLM pass instead of a render
+    issues = await asyncio.to_thread(preflight_issues, fixed_code)
+    if issues:
+        print(f"  ⚠ {label}: pre-flight found {len(issues)} issue(s), fixing again before rendering")
+        recheck_content = f"""CURRENT CODE (WITH ERROR):
+{fixed_code}
+
+ERROR MESSAGE:
+Pre-flight check failed:
+{chr(10).join(issues)}
+
+Fix the code to resolve this error. Return the complete corrected code.
+"""
+        refixed_code, problem, messages = await stream_code_with_retry("review_code", system_message, recheck_content, llm)
+        if problem is None:
+            if "from manim import" not in refixed_code:
+                refixed_code = "from manim import *\nfrom math import *\n\n" + refixed_code
+            issues = await asyncio.to_thread(preflight_issues, refixed_code)
+            fixed_code = refixed_code
+        if problem is not None or issues:
+            # Known to fail - leave the render slot to the other candidates
+            error = problem or "Pre-flight check failed:\n" + "\n".join(issues)
+            print(f"  ✗ {label}: still failing after the pre-flight fix, not rendering")
+            return {"code": fixed_code, "video_path": None, "error": error, "code_issue": error, "temp_file_path": None}
+    
+    print(f"  ✓ {label}: code fixed ({len(fixed_code)} characters), rendering...")
+    result = await render_code(fixed_code, "Scene1")
+    
+    if result["error"] is not None:
+        print(f"  ✗ {label}: fixed code still failed")
+        if llm_cache is not None:
+            await asyncio.to_thread(llm_cache.delete, llm_cache_key(llm, messages))
+        return {"code": fixed_code, "video_path": None, "error": result["error"], "code_issue": None,
+                "temp_file_path": result["temp_file_path"]}
+    
+    print(f"  ✓ {label}: rendered")
+    return {"code": fixed_code, "video_path": result["video_path"], "error": None, "code_issue": None,
+            "temp_file_path": None}
+
 
 # ============================================================================
 # Conditional Routing Function
 # ============================================================================
+def check_generation_status(state: State) -> Literal["review_code", "execute_manim"]:
+    """
+    Skip the render when generate_code or the pre-flight check already know the code is unusable.
+    """
+    if state.get("code_issue"):
+        print(f"\n[Routing] Unusable code, routing straight to review_code node")
+        return "review_code"
+    return "execute_manim"
+
+
 def check_execution_status(state: State) -> Literal["review_code", "end"]:
     """
     Check if execute_manim had an error.
@@ -605,26 +1649,53 @@ def check_execution_status(state: State) -> Literal["review_code", "end"]:
 # ============================================================================
 # Build LangGraph Workflow
 # ============================================================================
-def build_graph():
+def build_graph(planner_mode: str = PLANNER_MODE, speculative: bool = SPECULATIVE_RETRIEVAL):
     """
     Build the LangGraph workflow connecting all nodes.
+    With planner_mode="fused", plan_animation replaces generate_story + generate_syntax_questions.
+    With speculative=True the graph fans out at START: speculative_rag runs alongside the
+    planner and both branches join at rag_search.
     """
     builder = StateGraph(State)
     
     # Add nodes
-    builder.add_node("generate_story", generate_story)
-    builder.add_node("generate_syntax_questions", generate_syntax_questions)
-    builder.add_node("rag_search", rag_search)
-    builder.add_node("generate_code", generate_code)
-    builder.add_node("execute_manim", execute_manim)
-    builder.add_node("review_code", review_code)
+    if planner_mode == "fused":
+        builder.add_node("plan_animation", track_node("plan_animation", plan_animation))
+    else:
+        builder.add_node("generate_story", track_node("generate_story", generate_story))
+        builder.add_node("generate_syntax_questions", track_node("generate_syntax_questions", generate_syntax_questions))
+    if speculative:
+        builder.add_node("speculative_rag", track_node("speculative_rag", speculative_rag))
+    builder.add_node("rag_search", track_node("rag_search", rag_search))
+    builder.add_node("generate_code", track_node("generate_code", generate_code))
+    builder.add_node("validate_code", track_node("validate_code", validate_code))
+    builder.add_node("execute_manim", track_node("execute_manim", execute_manim))
+    builder.add_node("review_code", track_node("review_code", review_code))
     
     # Define workflow edges
-    builder.add_edge(START, "generate_story")
-    builder.add_edge("generate_story", "generate_syntax_questions")
-    builder.add_edge("generate_syntax_questions", "rag_search")
+    if planner_mode == "fused":
+        builder.add_edge(START, "plan_animation")
+        planner_end = "plan_animation"
+    else:
+        builder.add_edge(START, "generate_story")
+        builder.add_edge("generate_story", "generate_syntax_questions")
+        planner_end = "generate_syntax_questions"
+    if speculative:
+        # rag_search waits for both branches
+        builder.add_edge(START, "speculative_rag")
+        builder.add_edge([planner_end, "speculative_rag"], "rag_search")
+    else:
+        builder.add_edge(planner_end, "rag_search")
     builder.add_edge("rag_search", "generate_code")
-    builder.add_edge("generate_code", "execute_manim")
+    builder.add_edge("generate_code", "validate_code")
+    builder.add_conditional_edges(
+        "validate_code",
+        check_generation_status,
+        {
+            "review_code": "review_code",
+            "execute_manim": "execute_manim"
+        }
+    )
     
     # Conditional routing after execute_manim
     builder.add_conditional_edges(
@@ -639,18 +1710,46 @@ def build_graph():
     # review_code always goes to END (no retry loop)
     builder.add_edge("review_code", END)
     
-    return builder.compile()
+    compiled = builder.compile()
+    print(f"✓ LangGraph workflow compiled successfully (planner: {planner_mode}, speculative retrieval: {speculative})")
+    return compiled
+
+# The graph is compiled on first use (or by the startup task)
+graph = LazyResource("graph", build_graph)
+
+# Registry of background generation jobs
+job_manager = JobManager(history_limit=int(os.getenv("JOB_HISTORY_LIMIT", "200")))
+
+
+def build_initial_state(query: str) -> dict:
+    """
+    Create the initial LangGraph state for a query.
+    """
+    return {
+        "query": query,
+        "story": "",
+        "syntax_questions": [],
+        "rag_responses": [],
+        "rag_documents": [],
+        "speculative_queries": [],
+        "speculative_documents": [],
+        "retrieval_queries": [],
+        "code": "",
+        "code_issue": None,
+        "video_path": None,
+        "error": None,
+        "attempt_count": 0,
+        "temp_file_path": None,
+        "code_cache_key": None
+    }
 
-# Compile the graph
-graph = build_graph()
-print("✓ LangGraph workflow compiled successfully")
 
 
 # ============================================================================
 # FastAPI Endpoints
 # ============================================================================
 @app.post("/generate")
-async def generate_video(request: QueryRequest):
+async def generate_video(request: QueryRequest, http_request: Request):
     """
     Generate a Manim animation video from a text query.
     
@@ -666,21 +1765,14 @@ async def generate_video(request: QueryRequest):
     print(f"{'='*80}")
     
     try:
+        upgrade_quality = request_upgrade_quality(request.upgrade_quality)
+        render_origin.set({"source": "generate", "query": request.query, "job_id": None})
+
         # Initialize state
-        initial_state = {
-            "query": request.query,
-            "story": "",
-            "syntax_questions": [],
-            "rag_responses": [],
-            "code": "",
-            "video_path": None,
-            "error": None,
-            "attempt_count": 0,
-            "temp_file_path": None
-        }
+        initial_state = build_initial_state(request.query)
         
         # Run the graph
-        final_state = graph.invoke(initial_state)
+        final_state = await graph.get().ainvoke(initial_state)
         
         # Check if video was generated successfully
         if final_state.get("error") is None and final_state.get("video_path"):
@@ -688,18 +1780,24 @@ async def generate_video(request: QueryRequest):
             
             if video_path.exists():
                 print(f"\n✓ SUCCESS: Returning video file {video_path}")
-                
-                
-                # Return the video file directly with custom headers for metadata
-                return FileResponse(
-                    path=video_path,
-                    media_type="video/mp4",
-                    filename=f"animation_{request.query[:30].replace(' ', '_')}.mp4",
-                    headers={
-                        "X-Query": final_state.get("query", ""),
-                        "X-Success": "true",
-                        "X-Code-File-Path": str(OUTPUT_DIR / f"generated_code_{Path(video_path).stem.replace('animation_', '')}.py")
-                    }
+
+                headers = {
+                    "X-Query": final_state.get("query", ""),
+                    "X-Success": "true",
+                    "X-Code-File-Path": str(code_file_path_for(video_path)),
+                    "X-Quality": PREVIEW_QUALITY
+                }
+                upgrade = schedule_upgrade(final_state["code"], "Scene1", request.query, upgrade_quality)
+                if upgrade is not None:
+                    headers["X-Upgrade-Id"] = upgrade["upgrade_id"]
+                    headers["X-Upgrade-Quality"] = upgrade["quality"]
+
+                # Return the preview video directly with custom headers for metadata
+                return video_response(
+                    http_request,
+                    video_path,
+                    f"animation_{request.query[:30].replace(' ', '_')}.mp4",
+                    headers
                 )
             else:
                 print(f"\n✗ FAILED: Video file not found at {video_path}")
@@ -717,53 +1815,312 @@ async def generate_video(request: QueryRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ============================================================================
+# Quality Upgrades
+# ============================================================================
+def request_upgrade_quality(value: Optional[str], default: Optional[str] = UPGRADE_QUALITY) -> Optional[str]:
+    """
+    The upgrade tier for a request (None: no upgrade); invalid values are a 400.
+    Upgrading to the preview quality itself is skipped.
+    """
+    try:
+        quality = resolve_quality(value, default)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return quality if quality != PREVIEW_QUALITY else None
+
+
+async def run_quality_upgrade(job: Job, code: str, scene_name: str, quality: str) -> dict:
+    """
+    Re-render finished code at a higher quality tier as a low-priority background job.
+    """
+    print(f"\n⬆ UPGRADE {job.id}: rendering {scene_name} at {quality}")
+    render_origin.set({"source": "upgrade", "query": job.query, "job_id": job.id})
+    # Serial render: segments would each take a worker and bypass the upgrade cap
+    async with upgrade_slots:
+        result = await render_code(
+            code, scene_name, priority=PRIORITY_UPGRADE, dry_run=False, quality=quality, parallel=False
+        )
+    if result["error"] is not None:
+        raise RuntimeError(result["error"])
+
+    print(f"✓ UPGRADE {job.id} SUCCEEDED: {result['video_path']}")
+    return {
+        "quality": quality,
+        "video_url": f"/jobs/{job.id}/video",
+        "video_path": result["video_path"],
+        "code_file_path": result["code_path"],
+        "cache_hit": result["cache_hit"]
+    }
+
+
+def schedule_upgrade(code: str, scene_name: str, description: str, quality: Optional[str]) -> Optional[dict]:
+    """
+    Queue a background re-render of `code` at `quality` and return where to follow it.
+    The upgrade is a regular job: poll /jobs/{id}, subscribe to /jobs/{id}/events
+    (job_succeeded) and download /jobs/{id}/video once it has finished.
+    """
+    if quality is None or not code:
+        return None
+    job = job_manager.submit(
+        f"[{quality}] {description}",
+        functools.partial(run_quality_upgrade, code=code, scene_name=scene_name, quality=quality)
+    )
+    return {
+        "upgrade_id": job.id,
+        "quality": quality,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+        "video_url": f"/jobs/{job.id}/video"
+    }
+
+
+# ============================================================================
+# Job-based Generation API
+# ============================================================================
+async def run_generation_job(job: Job, upgrade_quality: Optional[str] = None) -> dict:
+    """
+    Run the LangGraph pipeline for a background job and return its result payload.
+    Raises on failure so the job is marked as failed.
+    """
+    print(f"\n{'='*80}")
+    print(f"NEW JOB {job.id}: {job.query}")
+    print(f"{'='*80}")
+    render_origin.set({"source": "job", "query": job.query, "job_id": job.id})
+
+    final_state = await graph.get().ainvoke(build_initial_state(job.query))
+
+    if final_state.get("error") is not None or not final_state.get("video_path"):
+        raise RuntimeError(final_state.get("error") or "Unknown error occurred")
+
+    video_path = Path(final_state["video_path"])
+    if not video_path.exists():
+        raise RuntimeError("Video file not found after generation")
+
+    print(f"\n✓ JOB {job.id} SUCCEEDED: {video_path}")
+    return {
+        "video_url": f"/jobs/{job.id}/video",
+        "video_path": str(video_path),
+        "code_file_path": str(code_file_path_for(video_path)),
+        "code": final_state.get("code", ""),
+        "quality": PREVIEW_QUALITY,
+        "upgrade": schedule_upgrade(final_state.get("code", ""), "Scene1", job.query, upgrade_quality)
+    }
+
+
+def get_job_or_404(job_id: str) -> Job:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: QueryRequest):
+    """
+    Start generating a video in the background and return the job id immediately.
+    Poll GET /jobs/{job_id} or subscribe to GET /jobs/{job_id}/events for progress.
+    """
+    upgrade_quality = request_upgrade_quality(request.upgrade_quality)
+    job = job_manager.submit(request.query, functools.partial(run_generation_job, upgrade_quality=upgrade_quality))
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events"
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Return the status, per-node timings and (once finished) the result of a job.
+    """
+    return get_job_or_404(job_id).to_dict()
+
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Server-Sent Events stream of job progress: node_started / node_finished for every
+    LangGraph node, then job_succeeded or job_failed. Past events are replayed first.
+    """
+    job = get_job_or_404(job_id)
+
+    async def event_stream():
+        # A comment line every 15 seconds keeps proxies from closing an idle connection
+        async for event in job.subscribe(keepalive=15):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/jobs/{job_id}/video")
+async def get_job_video(job_id: str, request: Request):
+    """
+    Download the video produced by a finished job (supports Range and If-None-Match).
+    """
+    job = get_job_or_404(job_id)
+    if job.status not in TERMINAL_STATES:
+        raise HTTPException(status_code=409, detail=f"Job is still {job.status}")
+    if not job.result:
+        raise HTTPException(status_code=404, detail=job.error or "Job produced no video")
+
+    video_path = Path(job.result["video_path"])
+    if not video_path.exists():
+        raise HTTPException(status_code=404, detail="Video file no longer exists")
+
+    return video_response(
+        request,
+        video_path,
+        f"animation_{job.query[:30].replace(' ', '_')}.mp4",
+        {
+            "X-Query": job.query,
+            "X-Success": "true",
+            "X-Code-File-Path": job.result["code_file_path"]
+        }
+    )
+
+
+@app.get("/videos/{name:path}")
+async def get_video(name: str, request: Request):
+    """
+    Stream a rendered video by its X-Video-Url path, with Range (206) and ETag (304) support
+    so players can seek and reload without downloading the whole file again.
+    """
+    video_path = (OUTPUT_DIR / name).resolve()
+    if video_path.suffix != ".mp4" or not video_path.is_relative_to(OUTPUT_DIR.resolve()):
+        raise HTTPException(status_code=404, detail=f"Video not found: {name}")
+    if not video_path.is_file():
+        raise HTTPException(status_code=404, detail=f"Video not found: {name}")
+    return video_response(request, video_path, video_path.name, {"X-Success": "true"})
+
+
 @app.get("/get_code/{filename}")
 async def get_code(filename: str):
     """
     Retrieve the generated Manim code for a specific animation.
     
     Args:
-        filename: The filename of the generated code (e.g., 'generated_code_tmpxxx.py' or just 'tmpxxx')
+        filename: The filename of the generated code (e.g., 'generated_code_tmpxxx.py'), the artifact
+            id ('tmpxxx'), a prefix of it, a render id or the sha256 code hash
     
     Returns:
         The generated Python code content
     """
     # Handle both full filename and just the temp name
-    if not filename.endswith('.py'):
-        filename = f"generated_code_{filename}.py"
-    
-    if not filename.startswith('generated_code_'):
-        filename = f"generated_code_{filename}"
-    
-    code_path = OUTPUT_DIR / filename
-    
+    artifact_id = Path(filename).name.removesuffix('.py').removeprefix('generated_code_')
+
+    # Indexed lookups: latest render of the artifact, render id, artifact id prefix, then code hash
+    record = (
+        artifact_index.latest(artifact_id)
+        or artifact_index.get(artifact_id)
+        or artifact_index.find_prefix(artifact_id)
+    )
+    if record is None and re.fullmatch(r"[0-9a-f]{64}", artifact_id):
+        record = artifact_index.find_by_code_hash(artifact_id)
+
+    if record is not None and record["code_path"]:
+        code_path = Path(record["code_path"])
+    else:
+        # Files written before the index existed
+        code_path = OUTPUT_DIR / f"generated_code_{artifact_id}.py"
+
     if not code_path.exists():
-        # Try to find a matching file
-        matching_files = list(OUTPUT_DIR.glob(f"*{filename.replace('generated_code_', '').replace('.py', '')}*.py"))
-        if matching_files:
-            code_path = matching_files[0]
-        else:
-            raise HTTPException(status_code=404, detail=f"Code file not found: {filename}")
+        raise HTTPException(status_code=404, detail=f"Code file not found: {filename}")
     
     try:
         with open(code_path, 'r', encoding='utf-8') as f:
             code_content = f.read()
+        artifact_store.touch(code_path)
         
         return {
             "filename": code_path.name,
             "code": code_content,
-            "path": str(code_path)
+            "path": str(code_path),
+            "artifact": artifact_view(record) if record is not None else None
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reading code file: {str(e)}")
 
+
+# ============================================================================
+# Artifact History API
+# ============================================================================
+def artifact_view(record: dict) -> dict:
+    """
+    An artifact index record with the URLs its video and code are served from.
+    """
+    video_url = None
+    if record["status"] == ARTIFACT_SUCCEEDED and record["video_path"]:
+        video_url = video_url_for(Path(record["video_path"]))
+    return {**record, "video_url": video_url, "code_url": f"/get_code/{record['artifact_id']}"}
+
+
+@app.get("/artifacts")
+async def list_artifacts(
+    limit: int = 20,
+    offset: int = 0,
+    query: Optional[str] = None,
+    status: Optional[str] = None,
+    source: Optional[str] = None,
+    code_hash: Optional[str] = None,
+    job_id: Optional[str] = None,
+    artifact_id: Optional[str] = None,
+    cache_key: Optional[str] = None
+):
+    """
+    Render history, newest first, from the artifact index.
+    Filters: query (substring of the request query), status (rendering / succeeded / failed /
+    cancelled / evicted), source (generate / job / upgrade / render / pipeline), code_hash, job_id,
+    artifact_id (module name, e.g. every render of a session) and cache_key.
+    """
+    page = await asyncio.to_thread(
+        artifact_index.list,
+        limit=max(1, min(limit, 100)),
+        offset=max(0, offset),
+        query=query,
+        status=status,
+        source=source,
+        code_hash=code_hash,
+        job_id=job_id,
+        artifact_id=artifact_id,
+        cache_key=cache_key
+    )
+    page["items"] = [artifact_view(item) for item in page["items"]]
+    return page
+
+
+@app.get("/artifacts/{render_id}")
+async def get_artifact(render_id: str):
+    """
+    Metadata of a single render by render id, or of the latest render of an artifact id.
+    """
+    record = artifact_index.get(render_id) or artifact_index.latest(render_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Artifact not found: {render_id}")
+    return artifact_view(record)
+
+
 class RenderRequest(BaseModel):
     filename: str
     code: str
     SceneName: str = "Scene1"
+    dry_run: Optional[bool] = None  # None: use RENDER_DRY_RUN
+    quality: Optional[str] = None  # None: PREVIEW_QUALITY
+    parallel: Optional[bool] = None  # None: use RENDER_PARALLEL
+    session_id: Optional[str] = None  # Editor session / document id: re-renders reuse unchanged animations
+    upgrade_quality: Optional[str] = None  # None: no background upgrade
 
 @app.post("/render")
-async def render_video(request: RenderRequest):
+async def render_video(request: RenderRequest, http_request: Request):
     """
     Execute the Manim code and return the video output.
     """
@@ -775,93 +2132,204 @@ async def render_video(request: RenderRequest):
         error_msg = "No code to execute"
         raise HTTPException(status_code=400, detail=error_msg)
     
-    # Create temporary Python file
-    temp_file = tempfile.NamedTemporaryFile(
-        mode='w',
-        suffix='.py',
-        delete=False,
-        dir='.',
-        encoding='utf-8'
-    )
-    
     try:
-        # Write code to temp file
-        temp_file.write(code)
-        temp_file.close()
-        temp_file_path = temp_file.name
-        
-        print(f"  Created temp file: {temp_file_path}")
-        
-        # Save the code to a permanent file as well
-        code_output_path = OUTPUT_DIR / f"generated_code_{Path(temp_file_path).stem}.py"
-        with open(code_output_path, 'w', encoding='utf-8') as f:
-            f.write(code)
-        print(f"  Saved code to: {code_output_path}")
-        
-        # Execute Manim
-        print(f"  Running: manim -ql {temp_file_path} {SceneName}")
-        result = subprocess.run(
-            ["manim", "-ql", temp_file_path, SceneName],
-            capture_output=True,
-            text=True,
-            timeout=120  # 2 minutes timeout
+        quality = resolve_quality(request.quality, PREVIEW_QUALITY)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    upgrade_quality = request_upgrade_quality(request.upgrade_quality, default=None)
+    try:
+        module_name = session_module_name(request.session_id) if request.session_id else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    render_origin.set({"source": "render", "query": None, "job_id": None})
+    result = await render_code(code, SceneName, priority=PRIORITY_INTERACTIVE, dry_run=request.dry_run,
+                               quality=quality, parallel=request.parallel, module_name=module_name)
+    if result["error"] is not None:
+        raise HTTPException(status_code=500, detail=result["error"])
+
+    headers = {
+        "X-Success": "true",
+        "X-Cache": "HIT" if result["cache_hit"] else "MISS",
+        "X-Code-File-Path": result["code_path"],
+        "X-Quality": quality
+    }
+    if result["partial_cache"] is not None:
+        headers["X-Partial-Cache-Hits"] = str(result["partial_cache"]["cached"])
+        headers["X-Partial-Cache-Animations"] = str(result["partial_cache"]["animations"])
+    if upgrade_quality is not None and upgrade_quality != quality:
+        upgrade = schedule_upgrade(code, SceneName, filename, upgrade_quality)
+        headers["X-Upgrade-Id"] = upgrade["upgrade_id"]
+        headers["X-Upgrade-Quality"] = upgrade["quality"]
+
+    return video_response(http_request, Path(result["video_path"]), f"animation_{filename}.mp4", headers)
+
+
+@app.get("/render/stats")
+async def render_stats():
+    """
+    Render scheduler metrics (workers, in-flight renders, queue depth, wait times),
+    render cache hit/miss counters, artifact store usage, partial movie reuse, dry-run and segment-parallel counters and
+    fork server vs subprocess timings.
+    """
+    return {
+        **render_scheduler.stats(),
+        "cache": render_cache.stats() if render_cache is not None else None,
+        "artifacts": {**artifact_store.stats(), "index": artifact_index.stats()},
+        "dry_run": {
+            "enabled": RENDER_DRY_RUN,
+            **dry_run_stats,
+            "seconds": round(dry_run_stats["seconds"], 2)
+        },
+        "partial_movie_cache": {
+            **partial_cache_stats,
+            "hit_rate": round(partial_cache_stats["cached"] / partial_cache_stats["animations"], 3)
+            if partial_cache_stats["animations"] else 0.0
+        },
+        "parallel": {
+            "enabled": RENDER_PARALLEL,
+            **parallel_render_stats,
+            "seconds": round(parallel_render_stats["seconds"], 2)
+        },
+        "fork_server": manim_fork_server.peek().stats() if manim_fork_server.peek() is not None else None,
+        "backends": {
+            backend: {
+                "runs": counts["runs"],
+                "avg_seconds": round(counts["seconds"] / counts["runs"], 3) if counts["runs"] else 0.0
+            }
+            for backend, counts in render_backend_stats.items()
+        }
+    }
+
+
+@app.get("/rag/stats")
+async def rag_stats():
+    """
+    Retrieval mode and query embedding cache metrics for the RAG node.
+    """
+    return {
+        "vectorstore": "loaded" if vectorstore.peek() else ("not available" if vectorstore.loaded else "loading"),
+        "retrieval_mode": "hybrid" if lexical_index.peek() is not None else "dense",
+        "embedding_cache": embeddings.peek().stats() if embeddings.loaded else None
+    }
+
+
+@app.get("/fix/stats")
+async def fix_stats():
+    """
+    Fix cache metrics: lookups, hit rate, patch success rate per rule / learned fix.
+    """
+    if fix_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **(await asyncio.to_thread(fix_cache.stats))}
+
+
+@app.get("/llm/stats")
+async def llm_stats():
+    """
+    LLM response cache metrics: entries and per-stage hit rates.
+    """
+    if llm_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **(await asyncio.to_thread(llm_cache.stats))}
+
+
+# ============================================================================
+# Startup, Warmup and Readiness
+# ============================================================================
+# Run one embedding and a bare `import manim` after loading, so the first request doesn't pay for it
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() in ("1", "true", "yes")
+
+startup_state = {"ready": False, "error": None}
+
+
+def load_resources() -> None:
+    """
+    Build every lazy resource (runs in a worker thread after the server starts accepting connections).
+    """
+    for resource in (llm_fast, llm_code, llm_plan, embeddings, vectorstore, lexical_index, manim_api_index, manim_fork_server, graph):
+        resource.get()
+
+
+async def warm_up() -> None:
+    with timed_phase("warmup_embedding"):
+        await asyncio.to_thread(embeddings.get().embed_query, "How to create a circle in Manim?")
+
+    with timed_phase("warmup_manim_import"):
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-c", "import manim",
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
         )
-        
-        if result.returncode != 0:
-            error_msg = result.stderr.strip() or "Unknown execution error"
-            print(f"✗ Manim execution failed:")
-            print(result.stderr)
-            raise HTTPException(status_code=500, detail=error_msg)
-        
-        # Find the generated video
-        # Manim outputs to media/videos/{filename}/480p15/Scene1.mp4
-        video_pattern = Path("media/videos")
-        
-        # Search for the generated video
-        temp_filename = Path(temp_file_path).stem
-        expected_video_dir = video_pattern / temp_filename / "480p15"
-        expected_video_path = expected_video_dir / "Scene1.mp4"
-        
-        if expected_video_path.exists():
-            # Copy video to output directory
-            final_video_path = OUTPUT_DIR / f"animation_{temp_filename}.mp4"
-            shutil.copy2(expected_video_path, final_video_path)
-            
-            print(f"✓ Video generated successfully: {final_video_path}")
-            
-            # Clean up temp file
-            try:
-                os.remove(temp_file_path)
-            except:
-                pass
-            
-            # return {
-            #     "video_path": str(final_video_path),
-            #     "error": None,
-            #     "temp_file_path": None
-            # }
-            return FileResponse(
-                    path=str(final_video_path),
-                    media_type="video/mp4",
-                    filename=f"animation_{filename}.mp4",
-                    headers={
-                        "X-Success": "true",
-                        "X-Code-File-Path": str(OUTPUT_DIR / f"generated_code_{Path(final_video_path).stem.replace('animation_', '')}.py")
-                    }
-                )
-        else:
-            error_msg = f"Video file not found at expected path: {expected_video_path}"
-            print(f"✗ {error_msg}")
-            raise HTTPException(status_code=500, detail=error_msg)
-    except subprocess.TimeoutExpired:
-        error_msg = "Manim execution timed out (120 seconds)"
-        print(f"✗ {error_msg}")
-        raise HTTPException(status_code=500, detail=error_msg)
-    
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            print(f"⚠ Warning: manim import failed during warmup: {stderr.decode(errors='replace').strip()}")
+
+
+async def initialize_backend() -> None:
+    try:
+        await asyncio.to_thread(load_resources)
+        if STARTUP_WARMUP:
+            await warm_up()
+        startup_state["ready"] = True
+        print("✓ Backend ready. Startup breakdown:")
+        print(format_timings())
     except Exception as e:
-        print(f"\n✗ EXCEPTION: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
-    
+        startup_state["error"] = str(e)
+        print(f"✗ Backend initialization failed: {e}")
+
+
+@app.on_event("startup")
+async def start_background_initialization():
+    """
+    Load models and the vector store in the background so the server accepts connections immediately.
+    """
+    startup_state["task"] = asyncio.create_task(initialize_backend())
+    if ARTIFACT_SWEEP_INTERVAL > 0:
+        startup_state["sweeper"] = asyncio.create_task(sweep_artifacts())
+
+
+async def sweep_artifacts() -> None:
+    """
+    Periodically remove temp modules and media orphaned by failed renders and apply the age quota.
+    """
+    while True:
+        try:
+            freed = await asyncio.to_thread(artifact_store.sweep)
+            if freed:
+                print(f"✓ Artifact sweep freed {freed / (1024 * 1024):.1f} MB")
+        except Exception as e:
+            print(f"⚠ Warning: Artifact sweep failed: {e}")
+        await asyncio.sleep(ARTIFACT_SWEEP_INTERVAL)
+
+
+@app.on_event("shutdown")
+def stop_fork_server():
+    sweeper = startup_state.get("sweeper")
+    if sweeper is not None:
+        sweeper.cancel()
+    server = manim_fork_server.peek()
+    if server is not None:
+        server.stop()
+
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 200 once models, vector store and graph are loaded (and warmed up), 503 before.
+    """
+    body = {
+        "ready": startup_state["ready"],
+        "error": startup_state["error"],
+        "resources": {
+            resource.name: resource.status()
+            for resource in (llm_fast, llm_code, llm_plan, embeddings, vectorstore, lexical_index, manim_api_index, manim_fork_server, graph)
+        },
+        "timings": startup_timings
+    }
+    if not startup_state["ready"]:
+        return JSONResponse(status_code=503, content=body)
+    return body
 
 
 @app.get("/")
@@ -875,10 +2343,26 @@ async def root():
         "status": "running",
         "endpoints": {
             "POST /generate": "Generate video from text query (returns video file directly)",
-            "GET /get_code/{filename}": "Retrieve generated Manim code by filename",
+            "POST /jobs": "Start a background generation job (returns job id)",
+            "GET /jobs/{job_id}": "Job status, per-node timings and result",
+            "GET /jobs/{job_id}/events": "Server-Sent Events stream of job progress",
+            "GET /jobs/{job_id}/video": "Download the video of a finished job",
+            "GET /videos/{name}": "Stream a rendered video (Range / ETag support)",
+            "GET /get_code/{filename}": "Retrieve generated Manim code by filename, artifact id or code hash",
+            "GET /artifacts": "Paginated render history (filter by query, status, source, code_hash, job_id)",
+            "GET /artifacts/{render_id}": "Metadata of a single render",
+            "POST /render": "Render provided Manim code (served before /generate renders)",
+            "GET /render/stats": "Render scheduler queue depth, wait times and render cache hit rate",
+            "GET /llm/stats": "LLM response cache hit rates per stage",
+            "GET /fix/stats": "Fix cache hit and success rates",
+            "GET /rag/stats": "RAG query embedding cache hit rate",
+            "GET /ready": "Readiness probe with startup phase timings",
             "GET /": "API information (this page)"
         },
-        "chromadb_status": "loaded" if vectorstore else "not available"
+        "chromadb_status": "loaded" if vectorstore.peek() else ("not available" if vectorstore.loaded else "loading"),
+        "vector_backend": type(vectorstore.peek()).__name__ if vectorstore.peek() else None,
+        "ready": startup_state["ready"],
+        "render_queue": render_scheduler.stats()
     }
 
 
@@ -891,8 +2375,10 @@ if __name__ == "__main__":
     print("\n" + "="*80)
     print("🎬 MANIM VIDEO GENERATOR API")
     print("="*80)
-    print(f"ChromaDB: {'✓ Loaded' if vectorstore else '✗ Not available'}")
+    print(f"Vector store: {VECTOR_BACKEND} (loaded in background after startup)")
     print(f"Output Directory: {OUTPUT_DIR.absolute()}")
+    print(f"Render Workers: {render_scheduler.workers}")
+    print(f"Manim fork server: {'enabled' if MANIM_FORK_SERVER and fork_server_supported() else 'disabled'}")
     print(f"LLM Fast (story/questions): gemini-2.5-flash-lite")
     print(f"LLM Code (generation/fixing): gemini-2.5-flash")
     print("="*80 + "\n")
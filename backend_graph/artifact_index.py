@@ -0,0 +1,239 @@
+"""
+Artifact Index
+SQLite metadata for every render: which query, code (hash), scene, quality, timings, status
+and output files belong together. Written at render time, so lookups by id or code hash and
+paginated, filtered history listings are indexed queries instead of directory scans.
+"""
+
+import time
+import uuid
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from render_cache import normalize_code
+
+# Render lifecycle states
+ARTIFACT_RENDERING = "rendering"
+ARTIFACT_SUCCEEDED = "succeeded"
+ARTIFACT_FAILED = "failed"
+ARTIFACT_CANCELLED = "cancelled"
+ARTIFACT_EVICTED = "evicted"
+
+def code_hash(code: str) -> str:
+    """
+    Hash of the normalized code (cosmetic differences share a hash, as in the render cache).
+    """
+    return hashlib.sha256(normalize_code(code).encode("utf-8")).hexdigest()
+
+
+class ArtifactIndex:
+    """
+    One row per render, with its own id. `artifact_id` is the module name the files are named
+    after (animation_<artifact_id>.mp4) - shared by every re-render of an editor session - and
+    `cache_key` the render cache entry, so the history of a session or cache entry is a query.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS renders (
+                id TEXT PRIMARY KEY,
+                artifact_id TEXT NOT NULL,
+                cache_key TEXT,
+                code_hash TEXT NOT NULL,
+                query TEXT,
+                source TEXT NOT NULL,
+                job_id TEXT,
+                scene TEXT NOT NULL,
+                quality TEXT,
+                status TEXT NOT NULL,
+                video_path TEXT,
+                code_path TEXT,
+                error TEXT,
+                cache_hit INTEGER NOT NULL DEFAULT 0,
+                render_seconds REAL,
+                video_bytes INTEGER,
+                created_at REAL NOT NULL,
+                finished_at REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_renders_artifact_id ON renders (artifact_id, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_renders_cache_key ON renders (cache_key, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_renders_code_hash ON renders (code_hash, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_renders_created_at ON renders (created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_renders_status ON renders (status, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_renders_job_id ON renders (job_id)")
+        self._conn.commit()
+
+    def start(
+        self,
+        artifact_id: str,
+        code: str,
+        scene: str,
+        quality: Optional[str],
+        code_path: Optional[str],
+        cache_key: Optional[str] = None,
+        source: str = "pipeline",
+        query: Optional[str] = None,
+        job_id: Optional[str] = None
+    ) -> str:
+        """
+        Record a render that is starting and return its row id.
+        """
+        render_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO renders (id, artifact_id, cache_key, code_hash, query, source, job_id, scene, "
+                "quality, status, code_path, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (render_id, artifact_id, cache_key, code_hash(code), query, source, job_id, scene, quality,
+                 ARTIFACT_RENDERING, code_path, time.time())
+            )
+            self._conn.commit()
+        return render_id
+
+    def finish(
+        self,
+        render_id: Optional[str],
+        status: str,
+        video_path: Optional[str] = None,
+        error: Optional[str] = None,
+        cache_hit: bool = False,
+        render_seconds: Optional[float] = None
+    ) -> None:
+        """
+        Record the outcome of a render started with `start` (None: it never started).
+        """
+        if render_id is None:
+            return
+        video_bytes = None
+        if video_path is not None:
+            try:
+                video_bytes = Path(video_path).stat().st_size
+            except OSError:
+                pass
+        with self._lock:
+            self._conn.execute(
+                "UPDATE renders SET status = ?, video_path = ?, error = ?, cache_hit = ?, "
+                "render_seconds = ?, video_bytes = ?, finished_at = ? WHERE id = ?",
+                (status, video_path, error, int(cache_hit),
+                 round(render_seconds, 3) if render_seconds is not None else None,
+                 video_bytes, time.time(), render_id)
+            )
+            self._conn.commit()
+
+    def mark_evicted(self, artifact_ids: Iterable[str]) -> None:
+        """
+        The files of these artifacts were deleted (metadata is kept for the history).
+        """
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE renders SET status = ? WHERE artifact_id = ? AND status = ?",
+                [(ARTIFACT_EVICTED, artifact_id, ARTIFACT_SUCCEEDED) for artifact_id in artifact_ids]
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def _to_dict(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        record = dict(row)
+        record["cache_hit"] = bool(record["cache_hit"])
+        return record
+
+    def get(self, render_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM renders WHERE id = ?", (render_id,)).fetchone()
+        return self._to_dict(row)
+
+    def latest(self, artifact_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Most recent render of an artifact (module / session name).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM renders WHERE artifact_id = ? ORDER BY created_at DESC LIMIT 1", (artifact_id,)
+            ).fetchone()
+        return self._to_dict(row)
+
+    def find_prefix(self, prefix: str) -> Optional[Dict[str, Any]]:
+        """
+        Most recent render whose artifact id starts with prefix (an index range scan).
+        """
+        if not prefix:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM renders WHERE artifact_id >= ? AND artifact_id < ? ORDER BY created_at DESC LIMIT 1",
+                (prefix, prefix + "\U0010ffff")
+            ).fetchone()
+        return self._to_dict(row)
+
+    def find_by_code_hash(self, value: str) -> Optional[Dict[str, Any]]:
+        """
+        Most recent render of code with this hash.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM renders WHERE code_hash = ? ORDER BY created_at DESC LIMIT 1", (value,)
+            ).fetchone()
+        return self._to_dict(row)
+
+    def list(
+        self,
+        limit: int = 20,
+        offset: int = 0,
+        query: Optional[str] = None,
+        status: Optional[str] = None,
+        source: Optional[str] = None,
+        code_hash: Optional[str] = None,
+        job_id: Optional[str] = None,
+        artifact_id: Optional[str] = None,
+        cache_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Newest renders first. `query` matches a substring of the request query; the other
+        filters are exact. Returns {"items", "total", "limit", "offset", "next_offset"}.
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+        if query:
+            escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append("query LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        filters = (
+            ("status", status), ("source", source), ("code_hash", code_hash), ("job_id", job_id),
+            ("artifact_id", artifact_id), ("cache_key", cache_key)
+        )
+        for column, value in filters:
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM renders {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT * FROM renders {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                [*params, limit, offset]
+            ).fetchall()
+        return {
+            "items": [self._to_dict(row) for row in rows],
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "next_offset": offset + len(rows) if offset + len(rows) < total else None
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM renders GROUP BY status").fetchall()
+        by_status = {status: count for status, count in rows}
+        return {"renders": sum(by_status.values()), "by_status": by_status}
@@ -0,0 +1,269 @@
+"""
+Artifact Store
+Tracks the files renders leave in the output directory - grouped per render as
+animation_<id>.mp4 + generated_code_<id>.py - and keeps them within a size and age quota
+with least-recently-used eviction. Also removes manim's intermediate output once a video has
+been delivered and sweeps temp modules and media directories orphaned by failed renders.
+Files on disk are the source of truth, so the store survives restarts.
+"""
+
+import os
+import time
+import shutil
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+# Output file name prefixes -> artifact id is the rest of the stem
+ARTIFACT_PREFIXES = ("animation_", "generated_code_")
+
+# Shared, content-addressed manim caches (LaTeX and text rendering) - aged out, never per render
+SHARED_MEDIA_CACHES = ("Tex", "texts")
+
+
+def artifact_id_for(path: Path) -> Optional[str]:
+    """
+    The render id a video or code file in the output directory belongs to.
+    """
+    path = Path(path)
+    if path.suffix not in (".mp4", ".py"):
+        return None
+    for prefix in ARTIFACT_PREFIXES:
+        if path.stem.startswith(prefix):
+            return path.stem[len(prefix):]
+    return None
+
+
+def _remove(path: Path) -> int:
+    """
+    Delete a file or directory tree, returning the bytes freed.
+    """
+    try:
+        if path.is_dir():
+            size = sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+            shutil.rmtree(path, ignore_errors=True)
+            return size
+        size = path.stat().st_size
+        path.unlink()
+        return size
+    except OSError:
+        return 0
+
+
+class ArtifactStore:
+    """
+    LRU registry of render artifacts in `root` (not its sub-directories, e.g. the render cache,
+    which evicts on its own). `max_bytes` / `max_age` of 0 disable the respective quota.
+    `on_evict(artifact_id)` is called for every artifact whose files were deleted.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: int,
+        max_age: float = 0,
+        media_dir: Path = Path("media"),
+        work_dir: Path = Path("."),
+        temp_grace: float = 1800,
+        on_evict: Optional[Callable[[str], None]] = None
+    ):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.media_dir = Path(media_dir)
+        self.work_dir = Path(work_dir)
+        self.temp_grace = temp_grace
+        self.on_evict = on_evict
+        self.evictions = 0
+        self.sweeps = 0
+        self.swept_bytes = 0
+        self.intermediate_bytes = 0
+        self._lock = threading.Lock()
+        # id -> {"files": set of paths, "size": bytes, "last_used": timestamp}, least recently used first
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._total_bytes = 0
+        # Modules currently being rendered - never swept or evicted
+        self._active: Set[str] = set()
+        self._load()
+
+    def _load(self) -> None:
+        """
+        Rebuild the registry from the files on disk (mtime is refreshed on every access).
+        """
+        for path in self.root.iterdir():
+            artifact_id = artifact_id_for(path)
+            if artifact_id is None or not path.is_file():
+                continue
+            stat = path.stat()
+            entry = self._entries.setdefault(artifact_id, {"files": set(), "size": 0, "last_used": 0.0})
+            entry["files"].add(path)
+            entry["size"] += stat.st_size
+            entry["last_used"] = max(entry["last_used"], stat.st_mtime)
+            self._total_bytes += stat.st_size
+        for artifact_id, _ in sorted(self._entries.items(), key=lambda item: item[1]["last_used"]):
+            self._entries.move_to_end(artifact_id)
+
+    def add(self, artifact_id: str, paths: Iterable[Path]) -> None:
+        """
+        Register files produced for a render (again when the render adds its video) and
+        enforce the quota.
+        """
+        with self._lock:
+            entry = self._entries.setdefault(artifact_id, {"files": set(), "size": 0, "last_used": 0.0})
+            for path in paths:
+                path = Path(path)
+                entry["files"].add(path)
+            size = sum(path.stat().st_size for path in entry["files"] if path.exists())
+            self._total_bytes += size - entry["size"]
+            entry["size"] = size
+            entry["last_used"] = time.time()
+            self._entries.move_to_end(artifact_id)
+            self._enforce(entry["last_used"])
+
+    def touch(self, path: Path) -> None:
+        """
+        Mark the artifact a served file belongs to as recently used.
+        """
+        artifact_id = artifact_id_for(path)
+        with self._lock:
+            entry = self._entries.get(artifact_id)
+            if entry is None:
+                return
+            entry["last_used"] = time.time()
+            self._entries.move_to_end(artifact_id)
+            for file_path in entry["files"]:
+                try:
+                    os.utime(file_path)
+                except OSError:
+                    pass
+
+    def discard(self, path: Path) -> None:
+        """
+        Delete one file of an artifact (e.g. the code of an abandoned render); the artifact is
+        forgotten once it has no files left.
+        """
+        path = Path(path)
+        artifact_id = artifact_id_for(path)
+        with self._lock:
+            freed = _remove(path)
+            entry = self._entries.get(artifact_id)
+            if entry is None or path not in entry["files"]:
+                return
+            entry["files"].discard(path)
+            entry["size"] -= freed
+            self._total_bytes -= freed
+            if not entry["files"]:
+                del self._entries[artifact_id]
+
+    def _drop(self, artifact_id: str) -> bool:
+        """
+        Evict an artifact; artifacts of a running render (e.g. a session re-render) are kept.
+        """
+        if artifact_id in self._active:
+            return False
+        entry = self._entries.pop(artifact_id)
+        self._total_bytes -= entry["size"]
+        self.evictions += 1
+        for path in entry["files"]:
+            _remove(path)
+        if self.on_evict is not None:
+            self.on_evict(artifact_id)
+        return True
+
+    def _enforce(self, now: float) -> None:
+        # Always keep the most recent entry, even if it alone exceeds the budget
+        most_recent = next(reversed(self._entries), None)
+        for artifact_id, entry in list(self._entries.items()):
+            if artifact_id == most_recent:
+                break
+            if artifact_id in self._active:
+                continue
+            expired = self.max_age and now - entry["last_used"] > self.max_age
+            over_quota = self.max_bytes and self._total_bytes > self.max_bytes
+            if not (expired or over_quota):
+                break
+            self._drop(artifact_id)
+
+    def begin_render(self, module_name: str) -> None:
+        self._active.add(module_name)
+
+    def end_render(self, module_name: str) -> None:
+        """
+        Mark a module as idle; its media directory ages from now (session modules keep
+        their partial movie files until they have been idle for max_age).
+        """
+        self._active.discard(module_name)
+        try:
+            os.utime(self.media_dir / "videos" / module_name)
+        except OSError:
+            pass
+
+    def cleanup_intermediates(self, module_name: str) -> None:
+        """
+        Remove a module's partial movie files and images once its video has been delivered.
+        """
+        freed = 0
+        for kind in ("videos", "images"):
+            module_dir = self.media_dir / kind / module_name
+            if module_dir.exists():
+                freed += _remove(module_dir)
+        self.intermediate_bytes += freed
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Remove what renders left behind: temp modules (tmp*.py) and per-module media directories
+        of renders that are no longer running and older than temp_grace, idle session modules and
+        shared caches past max_age. Also applies the age quota to artifacts. Returns bytes freed.
+        """
+        now = now if now is not None else time.time()
+        freed = 0
+
+        def stale(path: Path, age: float) -> bool:
+            try:
+                return now - path.stat().st_mtime > age
+            except OSError:
+                return False
+
+        session_age = self.max_age or self.temp_grace
+        for path in self.work_dir.glob("tmp*.py"):
+            if path.stem not in self._active and stale(path, self.temp_grace):
+                freed += _remove(path)
+        for path in self.work_dir.glob("session_*.py"):
+            if path.stem not in self._active and stale(path, session_age):
+                freed += _remove(path)
+
+        for kind in ("videos", "images", "segments"):
+            for module_dir in (self.media_dir / kind).glob("*"):
+                name = module_dir.name
+                if name in self._active or not module_dir.is_dir():
+                    continue
+                age = session_age if name.startswith("session_") else self.temp_grace
+                if name.startswith(("tmp", "session_")) and stale(module_dir, age):
+                    freed += _remove(module_dir)
+
+        if self.max_age:
+            for cache in SHARED_MEDIA_CACHES:
+                for path in (self.media_dir / cache).glob("*"):
+                    if path.is_file() and stale(path, self.max_age):
+                        freed += _remove(path)
+            with self._lock:
+                self._enforce(now)
+
+        self.sweeps += 1
+        self.swept_bytes += freed
+        return freed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "artifacts": len(self._entries),
+            "size_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "max_age_seconds": self.max_age,
+            "evictions": self.evictions,
+            "active_renders": len(self._active),
+            "intermediate_bytes_removed": self.intermediate_bytes,
+            "sweeps": self.sweeps,
+            "swept_bytes": self.swept_bytes
+        }
@@ -0,0 +1,125 @@
+"""
+Streaming code extraction
+Strips markdown fences from a code completion while it streams in and spots fatal
+problems (syntax errors, oversized output) before the completion ends, so the stream
+can be cancelled and a retry or fix started right away. A missing Scene1 class or
+truncated code is reported once the completion has finished.
+"""
+
+import ast
+from typing import Optional, Tuple
+
+SCENE_NAME = "Scene1"
+
+# SyntaxErrors that only mean "the code is not finished yet"
+_INCOMPLETE_MARKERS = ("was never closed", "unexpected EOF", "unterminated triple-quoted", "EOF while scanning")
+
+
+def _is_incomplete(error: SyntaxError) -> bool:
+    return any(marker in str(error.msg) for marker in _INCOMPLETE_MARKERS)
+
+
+def _complete_prefix(code: str) -> int:
+    """
+    Length of the prefix ending before the last top-level definition and the decorator
+    lines directly above it (0 if there is none).
+    """
+    cut = max(code.rfind("\nclass "), code.rfind("\ndef "), 0)
+    while cut > 0:
+        line_start = code.rfind("\n", 0, cut)
+        if not code[line_start + 1:cut].startswith("@"):
+            break
+        cut = max(line_start, 0)
+    return cut
+
+
+class CodeStreamChecker:
+    """
+    Feed completion chunks as they arrive; `feed` returns a problem description as soon as
+    the code is known to be unusable, `finish` validates the complete code.
+    """
+
+    def __init__(self, max_chars: int = 20000):
+        self.max_chars = max_chars
+        self._head = ""          # text seen before deciding whether the code is fenced
+        self._code = ""
+        self._started = False
+        self._fenced = False
+        self.closed = False      # closing fence seen - anything after it is commentary
+        self._checked_upto = 0   # length of the prefix already parsed successfully
+
+    @property
+    def code(self) -> str:
+        return self._code.strip()
+
+    def feed(self, chunk: str) -> Optional[str]:
+        if self.closed or not chunk:
+            return None
+
+        if not self._started:
+            self._head += chunk
+            head = self._head.lstrip()
+            if head.startswith("```"):
+                # Wait for the end of the fence line (```python\n)
+                if "\n" not in head:
+                    return None
+                self._fenced = True
+                chunk = head.split("\n", 1)[1]
+            elif len(head) < 3 and "\n" not in head:
+                return None
+            else:
+                chunk = head
+            self._started = True
+
+        search_from = max(len(self._code) - 4, 0)
+        self._code += chunk
+        # A fence only closes the code at the start of a line
+        fence = self._code.find("\n```", search_from)
+        if fence == -1 and self._fenced and self._code.startswith("```"):
+            fence = 0
+        if fence != -1:
+            self._code = self._code[:fence]
+            self.closed = True
+
+        if len(self._code) > self.max_chars:
+            return f"Response exceeded {self.max_chars} characters"
+        return self._check_partial()
+
+    def _check_partial(self) -> Optional[str]:
+        """
+        Checks that are conclusive before the completion has finished. Scene classes are
+        not checked here: helper scenes may legitimately precede Scene1 (see finish).
+        """
+        # Everything before the last top-level definition (and its decorators) is a
+        # sequence of complete statements
+        last_top_level = _complete_prefix(self._code)
+        if last_top_level > self._checked_upto:
+            try:
+                ast.parse(self._code[:last_top_level])
+                self._checked_upto = last_top_level
+            except SyntaxError as e:
+                if not _is_incomplete(e):
+                    return f"Syntax error at line {e.lineno}: {e.msg}"
+        return None
+
+    def finish(self) -> Tuple[str, Optional[str]]:
+        """
+        The stripped code and the reason it is unusable (None if it looks runnable).
+        """
+        if not self._started:
+            self.feed("\n")
+        code = self.code
+        if not self._fenced and (code == "```" or code.endswith("\n```")):
+            code = code[:-3].strip()
+
+        if not code:
+            return code, "Empty response"
+        try:
+            tree = ast.parse(code)
+        except SyntaxError as e:
+            if _is_incomplete(e) or (self._fenced and not self.closed):
+                return code, f"Code is truncated: {e.msg} (line {e.lineno})"
+            return code, f"Syntax error at line {e.lineno}: {e.msg}"
+        if not any(isinstance(node, ast.ClassDef) and node.name == SCENE_NAME for node in tree.body):
+            return code, f"Missing class {SCENE_NAME}"
+        return code, None
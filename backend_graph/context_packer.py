@@ -0,0 +1,130 @@
+"""
+RAG Context Packer
+Turns the retrieved chunks for all syntax questions into a compact prompt section:
+duplicates are removed, chunks that overlap (the splitter uses a 150-char overlap) are merged,
+and the most relevant chunks fill a token budget, cut at line / code-block boundaries.
+"""
+
+import math
+from typing import Any, Dict, List, Tuple
+
+# Rough chars-per-token ratio for English text and Python code
+CHARS_PER_TOKEN = 4
+
+# Overlaps shorter than this are treated as coincidence, not splitter overlap
+MIN_OVERLAP = 20
+MAX_OVERLAP = 400
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _overlap(first: str, second: str) -> int:
+    """
+    Length of the longest suffix of `first` that is a prefix of `second`.
+    """
+    for size in range(min(len(first), len(second), MAX_OVERLAP), MIN_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return size
+    return 0
+
+
+def _merge_overlapping(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Repeatedly join pairs of chunks where one continues the other.
+    """
+    merged = True
+    while merged:
+        merged = False
+        for a in chunks:
+            for b in chunks:
+                if a is b:
+                    continue
+                size = _overlap(a["text"], b["text"])
+                if size:
+                    a["text"] = a["text"] + b["text"][size:]
+                    a["score"] += b["score"]
+                    a["questions"] = sorted(set(a["questions"]) | set(b["questions"]))
+                    chunks.remove(b)
+                    merged = True
+                    break
+            if merged:
+                break
+    return chunks
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """
+    Longest prefix within `max_tokens` that ends on a line boundary outside of a ``` code block.
+    Returns "" when no such prefix exists.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    best = ""
+    position = 0
+    in_code = False
+    for line in text.splitlines(keepends=True):
+        if position + len(line) > max_chars:
+            break
+        position += len(line)
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+        if not in_code:
+            best = text[:position]
+    return best.rstrip()
+
+
+def pack_context(hits: List[Dict[str, Any]], token_budget: int) -> Tuple[str, Dict[str, int]]:
+    """
+    Pack retrieved chunks into a prompt section.
+
+    Args:
+        hits: One entry per retrieved chunk: {"question_index": int (1-based), "rank": int (1-based), "text": str}
+        token_budget: Maximum estimated tokens for the packed context
+
+    Returns:
+        The packed text and stats (tokens before/after, chunks retrieved/unique/packed, tokens saved).
+    """
+    # Deduplicate identical chunks; a chunk found by several questions scores higher
+    by_text: Dict[str, Dict[str, Any]] = {}
+    for hit in hits:
+        text = hit["text"].strip()
+        if not text:
+            continue
+        chunk = by_text.setdefault(text, {"text": text, "score": 0.0, "questions": []})
+        chunk["score"] += 1.0 / hit["rank"]
+        if hit["question_index"] not in chunk["questions"]:
+            chunk["questions"].append(hit["question_index"])
+
+    unique_count = len(by_text)
+    chunks = _merge_overlapping(list(by_text.values()))
+    chunks.sort(key=lambda chunk: chunk["score"], reverse=True)
+
+    sections = []
+    used_tokens = 0
+    for chunk in chunks:
+        header = f"[Doc {len(sections) + 1}] (relevant to: {', '.join(f'Q{i}' for i in sorted(chunk['questions']))})\n"
+        remaining = token_budget - used_tokens - estimate_tokens(header)
+        if remaining <= 0:
+            break
+        text = chunk["text"]
+        if estimate_tokens(text) > remaining:
+            text = _truncate(text, remaining)
+            if not text:
+                continue
+        section = header + text
+        sections.append(section)
+        used_tokens += estimate_tokens(section) + 1
+
+    packed = "\n\n".join(sections)
+    tokens_before = sum(estimate_tokens(hit["text"]) for hit in hits)
+    tokens_after = estimate_tokens(packed)
+    return packed, {
+        "chunks_retrieved": len(hits),
+        "chunks_unique": unique_count,
+        "chunks_after_merge": len(chunks),
+        "chunks_packed": len(sections),
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": max(tokens_before - tokens_after, 0)
+    }
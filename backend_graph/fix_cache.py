@@ -0,0 +1,473 @@
+"""
+Fix Cache
+Repairs recurring manim failures without an LLM call. An error is reduced to a signature
+(exception type, offending symbol, last frame in the user module) which is matched against
+deterministic rewrite rules (ShowCreation -> Create, Tex -> MathTex, missing numpy import ...)
+and against substitutions learned from successful review_code fixes, stored in SQLite.
+"""
+
+import re
+import ast
+import time
+import sqlite3
+import difflib
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# ============================================================================
+# Error signatures
+# ============================================================================
+# Final line of a traceback ("NameError: name 'x' is not defined")
+_EXCEPTION_RE = re.compile(r"^(?:[\w.]+\.)?(\w+(?:Error|Exception|Exit))\s*:\s*(.*)$", re.MULTILINE)
+# Pre-flight report line ("Line 12: NameError: ...")
+_PREFLIGHT_RE = re.compile(r"^Line (\d+): (\w+): (.*)$", re.MULTILINE)
+# Plain and rich (manim) traceback frames
+_FRAME_RES = [
+    re.compile(r'File "([^"]+)", line (\d+), in (\S+)'),
+    re.compile(r"([^\s│\"']+\.py):(\d+) in (\S+)")
+]
+_LIBRARY_MARKERS = ("site-packages", "dist-packages", "/lib/python", "\\lib\\python", "<frozen")
+_QUOTED_RE = re.compile(r"'([^']+)'")
+_CALLABLE_RE = re.compile(r"([\w.]+)\(\) got an unexpected keyword argument '(\w+)'")
+
+
+def error_signatures(error_text: str) -> List[Dict[str, Any]]:
+    """
+    Signatures of the errors in a manim traceback or a pre-flight report (one per reported issue).
+    Each is {"key", "type", "symbol", "frame", "line", "message", "text"}.
+    """
+    error_text = error_text or ""
+    found = []
+
+    preflight = _PREFLIGHT_RE.findall(error_text)
+    if preflight:
+        for line, exc_type, message in preflight:
+            found.append(_signature(exc_type, message, "preflight", int(line), error_text))
+        return found
+
+    exceptions = _EXCEPTION_RE.findall(error_text)
+    if not exceptions:
+        return []
+    exc_type, message = exceptions[-1]
+
+    # Last frame that is not library code = the user's scene module
+    frame, line = "module", None
+    for pattern in _FRAME_RES:
+        for path, lineno, function in pattern.findall(error_text):
+            if not any(marker in path for marker in _LIBRARY_MARKERS):
+                frame, line = function, int(lineno)
+    return [_signature(exc_type, message.strip(), frame, line, error_text)]
+
+
+def _signature(exc_type: str, message: str, frame: str, line: Optional[int], text: str) -> Dict[str, Any]:
+    symbol = ""
+    callable_match = _CALLABLE_RE.search(message)
+    if callable_match:
+        symbol = callable_match.group(2)
+    elif exc_type == "AttributeError":
+        quoted = _QUOTED_RE.findall(message)
+        symbol = quoted[-1] if quoted else ""
+    else:
+        quoted = _QUOTED_RE.findall(message)
+        symbol = quoted[0] if quoted else ""
+    return {
+        "key": f"{exc_type}|{symbol}|{frame}",
+        "type": exc_type,
+        "symbol": symbol,
+        "frame": frame,
+        "line": line,
+        "message": message,
+        "text": text
+    }
+
+
+# ============================================================================
+# Deterministic rewrite rules
+# ============================================================================
+# Names from older manim versions (and ManimGL) -> Manim Community
+RENAMED_NAMES = {
+    "ShowCreation": "Create",
+    "TextMobject": "Text",
+    "TexMobject": "MathTex",
+    "TexText": "Tex",
+    "CircleIndicate": "Circumscribe",
+    "WiggleOutThenIn": "Wiggle",
+    "ShowCreationThenFadeOut": "ShowPassingFlash",
+    "ParametricFunction3D": "ParametricFunction"
+}
+
+# Renamed methods (AttributeError)
+RENAMED_METHODS = {
+    "get_graph": "plot",
+    "get_parametric_curve": "plot_parametric_curve",
+    "get_implicit_curve": "plot_implicit_curve"
+}
+
+# Misspelled / renamed keyword arguments (TypeError: unexpected keyword argument)
+RENAMED_KWARGS = {
+    "colour": "color",
+    "fill_colour": "fill_color",
+    "stroke_colour": "stroke_color",
+    "size": "font_size",
+    "text_size": "font_size",
+    "width": "stroke_width",
+    "thickness": "stroke_width",
+    "opacity": "fill_opacity"
+}
+
+# Modules generated code uses without importing them
+MISSING_IMPORTS = {
+    "np": "import numpy as np",
+    "numpy": "import numpy",
+    "random": "import random",
+    "itertools": "import itertools",
+    "math": "import math",
+    "time": "import time"
+}
+
+# Scene methods that only exist on a specialised Scene base class
+SCENE_BASE_FOR_METHOD = {
+    "set_camera_orientation": "ThreeDScene",
+    "move_camera": "ThreeDScene",
+    "begin_ambient_camera_rotation": "ThreeDScene",
+    "stop_ambient_camera_rotation": "ThreeDScene",
+    "add_fixed_in_frame_mobjects": "ThreeDScene",
+    "frame": "MovingCameraScene"
+}
+
+
+def _replace_word(code: str, old: str, new: str) -> Optional[str]:
+    patched = re.sub(rf"\b{re.escape(old)}\b", new, code)
+    return patched if patched != code else None
+
+
+def _edit_keyword(code: str, name: str, new_name: Optional[str], line: Optional[int]) -> Optional[str]:
+    """
+    Rename (or, with new_name=None, remove) keyword argument `name` in the calls on `line`
+    (all calls if line is None), splicing the source so formatting is kept.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    lines = code.splitlines(keepends=True)
+    offsets = [0]
+    for text in lines:
+        offsets.append(offsets[-1] + len(text))
+
+    spans = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call) or (line is not None and not node.lineno <= line <= node.end_lineno):
+            continue
+        for keyword in node.keywords:
+            if keyword.arg == name:
+                start = offsets[keyword.lineno - 1] + keyword.col_offset
+                end = offsets[keyword.end_lineno - 1] + keyword.end_col_offset
+                spans.append((start, end))
+    if not spans:
+        return None
+
+    # Apply from the end so earlier offsets stay valid
+    for start, end in sorted(spans, reverse=True):
+        if new_name is not None:
+            code = code[:start] + new_name + code[start + len(name):]
+            continue
+        # Drop the argument together with one adjacent comma
+        after = re.match(r"\s*,\s*", code[end:])
+        before = re.search(r",\s*$", code[:start])
+        if after:
+            end += after.end()
+        elif before:
+            start = before.start()
+        code = code[:start] + code[end:]
+    return code
+
+
+# Characters that are only valid in LaTeX math mode
+_MATH_ONLY_RE = re.compile(r"[\^_]|\\(?:frac|sqrt|sum|int|alpha|beta|theta|pi|cdot|times|leq|geq)\b")
+
+
+def _rename_calls(code: str, name: str, new_name: str, line: int) -> Optional[str]:
+    """
+    Rename the function of the `name(...)` calls spanning `line`, preferring the ones whose
+    string arguments contain math-only LaTeX (several Tex calls may share a line).
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    lines = code.splitlines(keepends=True)
+    offsets = [0]
+    for text in lines:
+        offsets.append(offsets[-1] + len(text))
+
+    calls = [
+        node for node in ast.walk(tree)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == name
+        and node.lineno <= line <= node.end_lineno
+    ]
+
+    def has_math(call: ast.Call) -> bool:
+        return any(
+            isinstance(arg, ast.Constant) and isinstance(arg.value, str) and _MATH_ONLY_RE.search(arg.value)
+            for arg in call.args
+        )
+
+    calls = [call for call in calls if has_math(call)] or calls
+    if not calls:
+        return None
+    starts = sorted((offsets[call.func.lineno - 1] + call.func.col_offset for call in calls), reverse=True)
+    for start in starts:
+        code = code[:start] + new_name + code[start + len(name):]
+    return code
+
+
+def _add_import(code: str, statement: str) -> Optional[str]:
+    if statement in code:
+        return None
+    lines = code.splitlines(keepends=True)
+    # After the last top-level import at the start of the file
+    position = 0
+    for i, text in enumerate(lines):
+        if text.startswith(("import ", "from ")):
+            position = i + 1
+        elif text.strip() and not text.startswith("#"):
+            break
+    lines.insert(position, statement + "\n")
+    return "".join(lines)
+
+
+def _set_scene_base(code: str, base: str) -> Optional[str]:
+    patched = re.sub(r"^(class\s+\w+\s*\()\s*Scene\s*(\)\s*:)", rf"\g<1>{base}\g<2>", code, flags=re.MULTILINE)
+    return patched if patched != code else None
+
+
+def _rule_renamed_name(signature, code):
+    new = RENAMED_NAMES.get(signature["symbol"])
+    if signature["type"] == "NameError" and new:
+        return _replace_word(code, signature["symbol"], new)
+
+
+def _rule_missing_import(signature, code):
+    statement = MISSING_IMPORTS.get(signature["symbol"])
+    if signature["type"] == "NameError" and statement:
+        return _add_import(code, statement)
+
+
+def _rule_renamed_method(signature, code):
+    new = RENAMED_METHODS.get(signature["symbol"])
+    if signature["type"] == "AttributeError" and new:
+        return _replace_word(code, signature["symbol"], new)
+
+
+def _rule_scene_base(signature, code):
+    base = SCENE_BASE_FOR_METHOD.get(signature["symbol"])
+    if signature["type"] == "AttributeError" and base:
+        return _set_scene_base(code, base)
+
+
+def _rule_keyword(signature, code):
+    if signature["type"] != "TypeError" or "unexpected keyword argument" not in signature["message"]:
+        return None
+    # Without the failing line, a rename like width -> stroke_width could hit valid calls
+    if signature["line"] is None:
+        return None
+    name = signature["symbol"]
+    new_name = RENAMED_KWARGS.get(name)
+    patched = _edit_keyword(code, name, new_name, signature["line"]) if new_name else None
+    # Unknown keyword: drop it (it was rejected anyway)
+    return patched or _edit_keyword(code, name, None, signature["line"])
+
+
+def _rule_tex_math_mode(signature, code):
+    # LaTeX math in Tex(...) fails to compile with "Missing $ inserted"; only the call that
+    # failed is switched - other Tex objects in the file hold plain text and compiled fine
+    if "Missing $ inserted" in signature["text"] and signature["line"] is not None:
+        return _rename_calls(code, "Tex", "MathTex", signature["line"])
+
+
+RULES: List[Tuple[str, Callable[[Dict[str, Any], str], Optional[str]]]] = [
+    ("renamed_name", _rule_renamed_name),
+    ("missing_import", _rule_missing_import),
+    ("renamed_method", _rule_renamed_method),
+    ("scene_base", _rule_scene_base),
+    ("keyword_argument", _rule_keyword),
+    ("tex_math_mode", _rule_tex_math_mode)
+]
+
+
+# ============================================================================
+# Learned substitutions
+# ============================================================================
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+# Learned substitutions are short token spans around the offending symbol
+MAX_LEARNED_TOKENS = 12
+
+
+def _tokens(code: str) -> List[Tuple[str, int, int]]:
+    return [(m.group(), m.start(), m.end()) for m in _TOKEN_RE.finditer(code)]
+
+
+def learn_substitutions(symbol: str, broken_code: str, fixed_code: str) -> List[Tuple[str, str]]:
+    """
+    (old, new) source snippets from the fix's token diff whose old side contains the offending symbol.
+    """
+    if not symbol:
+        return []
+    old_tokens = _tokens(broken_code)
+    new_tokens = _tokens(fixed_code)
+    matcher = difflib.SequenceMatcher(a=[t[0] for t in old_tokens], b=[t[0] for t in new_tokens], autojunk=False)
+
+    substitutions = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "replace" or i2 - i1 > MAX_LEARNED_TOKENS or j2 - j1 > MAX_LEARNED_TOKENS:
+            continue
+        if symbol not in (t[0] for t in old_tokens[i1:i2]):
+            continue
+        old = broken_code[old_tokens[i1][1]:old_tokens[i2 - 1][2]]
+        new = fixed_code[new_tokens[j1][1]:new_tokens[j2 - 1][2]]
+        if (old, new) not in substitutions:
+            substitutions.append((old, new))
+    return substitutions
+
+
+def _apply_substitution(code: str, old: str, new: str) -> Optional[str]:
+    # Token-aligned match: don't replace inside longer identifiers
+    pattern = rf"(?<!\w){re.escape(old)}(?!\w)"
+    patched = re.sub(pattern, lambda _: new, code)
+    return patched if patched != code else None
+
+
+# ============================================================================
+# Cache
+# ============================================================================
+class FixCache:
+    """
+    Looks up patches for an error and learns from fixes that rendered.
+    Learned substitutions that fail more often than they succeed are no longer applied.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS learned_fixes (
+                signature TEXT NOT NULL,
+                old TEXT NOT NULL,
+                new TEXT NOT NULL,
+                successes INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_used REAL,
+                PRIMARY KEY (signature, old, new)
+            )
+        """)
+        self._conn.commit()
+        self._stats = {"lookups": 0, "hits": 0, "successes": 0, "failures": 0, "learned": 0}
+        self._by_source: Dict[str, Dict[str, int]] = {}
+
+    def lookup(self, error_text: str, code: str) -> Optional[Dict[str, Any]]:
+        """
+        Patch the code for every error in error_text that a rule or learned fix matches.
+        Returns {"code", "sources": [...], "signatures": [...]} or None if nothing matched.
+        """
+        signatures = error_signatures(error_text)
+        with self._lock:
+            self._stats["lookups"] += 1
+        if not signatures:
+            return None
+
+        patched = code
+        sources = []
+        for signature in signatures:
+            result = self._patch_one(signature, patched)
+            if result is not None:
+                patched, source = result
+                sources.append(source)
+        if not sources:
+            return None
+
+        with self._lock:
+            self._stats["hits"] += 1
+        return {"code": patched, "sources": sources, "signatures": [s["key"] for s in signatures]}
+
+    def _patch_one(self, signature: Dict[str, Any], code: str) -> Optional[Tuple[str, Dict[str, str]]]:
+        for name, rule in RULES:
+            patched = rule(signature, code)
+            if patched is not None and patched != code:
+                return patched, {"kind": "rule", "name": name, "signature": signature["key"]}
+
+        # Fixes learned in the same frame first, then the same error and symbol anywhere
+        prefix = f"{signature['type']}|{signature['symbol']}|"
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT signature, old, new FROM learned_fixes "
+                "WHERE substr(signature, 1, ?) = ? AND successes >= failures "
+                "ORDER BY signature = ? DESC, successes DESC, created_at DESC",
+                (len(prefix), prefix, signature["key"])
+            ).fetchall()
+        for learned_signature, old, new in rows:
+            patched = _apply_substitution(code, old, new)
+            if patched is not None:
+                return patched, {"kind": "learned", "name": f"{old} -> {new}", "signature": learned_signature,
+                                 "old": old, "new": new}
+        return None
+
+    def record(self, patch: Dict[str, Any], success: bool) -> None:
+        """
+        Outcome of rendering a patch from lookup().
+        """
+        outcome = "successes" if success else "failures"
+        now = time.time()
+        with self._lock:
+            self._stats[outcome] += 1
+            for source in patch["sources"]:
+                counts = self._by_source.setdefault(source["name"], {"successes": 0, "failures": 0})
+                counts[outcome] += 1
+                if source["kind"] == "learned":
+                    self._conn.execute(
+                        f"UPDATE learned_fixes SET {outcome} = {outcome} + 1, last_used = ? "
+                        "WHERE signature = ? AND old = ? AND new = ?",
+                        (now, source["signature"], source["old"], source["new"])
+                    )
+            self._conn.commit()
+
+    def learn(self, error_text: str, broken_code: str, fixed_code: str) -> int:
+        """
+        Store the substitutions of a fix that rendered, keyed by the error's signature.
+        Returns how many were stored.
+        """
+        stored = 0
+        now = time.time()
+        with self._lock:
+            for signature in error_signatures(error_text):
+                for old, new in learn_substitutions(signature["symbol"], broken_code, fixed_code):
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO learned_fixes (signature, old, new, successes, failures, created_at) "
+                        "VALUES (?, ?, ?, 1, 0, ?)",
+                        (signature["key"], old, new, now)
+                    )
+                    stored += cursor.rowcount
+            self._stats["learned"] += stored
+            self._conn.commit()
+        return stored
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            learned_entries = self._conn.execute("SELECT COUNT(*) FROM learned_fixes").fetchone()[0]
+            stats = dict(self._stats)
+            by_source = {name: dict(counts) for name, counts in self._by_source.items()}
+        attempts = stats["successes"] + stats["failures"]
+        return {
+            **stats,
+            "hit_rate": round(stats["hits"] / stats["lookups"], 3) if stats["lookups"] else 0.0,
+            "success_rate": round(stats["successes"] / attempts, 3) if attempts else 0.0,
+            "learned_entries": learned_entries,
+            "rules": len(RULES),
+            "by_source": by_source
+        }
@@ -0,0 +1,182 @@
+"""
+Background Jobs for Manim Video Generation
+Runs the LangGraph pipeline outside of the HTTP request and publishes per-node progress events.
+"""
+
+import time
+import uuid
+import asyncio
+import functools
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+# Job lifecycle states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+TERMINAL_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+# The job whose pipeline is running in the current task (None for plain /generate calls)
+current_job: ContextVar[Optional["Job"]] = ContextVar("current_job", default=None)
+
+
+class Job:
+    """
+    A single generation run: its status, final result and the ordered list of progress events.
+    """
+
+    def __init__(self, query: str):
+        self.id = uuid.uuid4().hex
+        self.query = query
+        self.status = JOB_QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self._subscribers: List[asyncio.Queue] = []
+
+    def publish(self, event_type: str, **data) -> Dict[str, Any]:
+        """
+        Record an event and push it to every live subscriber.
+        """
+        event = {
+            "type": event_type,
+            "job_id": self.id,
+            "timestamp": time.time(),
+            **data
+        }
+        self.events.append(event)
+        for queue in self._subscribers:
+            queue.put_nowait(event)
+        return event
+
+    async def subscribe(self, keepalive: Optional[float] = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yield all past events, then live events until the job reaches a terminal state.
+        If `keepalive` is set, yield None whenever no event arrived for that many seconds.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        # Replay history and register in the same step so no event is lost in between
+        history = list(self.events)
+        self._subscribers.append(queue)
+        try:
+            for event in history:
+                yield event
+            if self.status in TERMINAL_STATES:
+                return
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield event
+                if event["type"] in ("job_succeeded", "job_failed"):
+                    return
+        finally:
+            self._subscribers.remove(queue)
+
+    def to_dict(self) -> Dict[str, Any]:
+        duration = None
+        if self.started_at is not None:
+            duration = round((self.finished_at or time.time()) - self.started_at, 3)
+        return {
+            "job_id": self.id,
+            "query": self.query,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration": duration,
+            "nodes": [
+                {k: v for k, v in event.items() if k not in ("job_id", "type")}
+                for event in self.events if event["type"] == "node_finished"
+            ],
+            "result": self.result,
+            "error": self.error
+        }
+
+
+class JobManager:
+    """
+    In-memory registry of generation jobs. Keeps the most recent `history_limit` finished jobs.
+    """
+
+    def __init__(self, history_limit: int = 200):
+        self.history_limit = history_limit
+        self._jobs: Dict[str, Job] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def submit(self, query: str, runner: Callable[[Job], Awaitable[Dict[str, Any]]]) -> Job:
+        """
+        Create a job and start `runner(job)` as a background task.
+        The runner returns the result dict on success and raises on failure.
+        """
+        self._prune()
+        job = Job(query)
+        self._jobs[job.id] = job
+        job.publish("job_queued", query=query)
+        self._tasks[job.id] = asyncio.create_task(self._run(job, runner))
+        return job
+
+    async def _run(self, job: Job, runner: Callable[[Job], Awaitable[Dict[str, Any]]]) -> None:
+        current_job.set(job)
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        job.publish("job_started")
+        try:
+            job.result = await runner(job)
+            job.status = JOB_SUCCEEDED
+            job.finished_at = time.time()
+            job.publish("job_succeeded", result=job.result, duration=round(job.finished_at - job.started_at, 3))
+        except Exception as e:
+            job.error = str(e)
+            job.status = JOB_FAILED
+            job.finished_at = time.time()
+            job.publish("job_failed", error=job.error, duration=round(job.finished_at - job.started_at, 3))
+        finally:
+            self._tasks.pop(job.id, None)
+
+    def _prune(self) -> None:
+        finished = [job for job in self._jobs.values() if job.status in TERMINAL_STATES]
+        excess = len(finished) - self.history_limit
+        if excess > 0:
+            finished.sort(key=lambda job: job.finished_at or 0)
+            for job in finished[:excess]:
+                del self._jobs[job.id]
+
+
+def track_node(name: str, func: Callable[[Any], Awaitable[dict]]) -> Callable[[Any], Awaitable[dict]]:
+    """
+    Wrap a LangGraph node so it publishes node_started / node_finished events (with timings)
+    to the job running in the current task. Outside of a job the node runs unchanged.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(state):
+        job = current_job.get()
+        if job is None:
+            return await func(state)
+
+        job.publish("node_started", node=name)
+        start = time.perf_counter()
+        try:
+            update = await func(state)
+        except Exception as e:
+            job.publish("node_failed", node=name, duration=round(time.perf_counter() - start, 3), error=str(e))
+            raise
+        job.publish(
+            "node_finished",
+            node=name,
+            duration=round(time.perf_counter() - start, 3),
+            error=(update or {}).get("error")
+        )
+        return update
+
+    return wrapper
@@ -0,0 +1,134 @@
+"""
+Lexical (BM25) index over the Manim docs chunks
+Precomputed inverted index that matches exact API identifiers (next_to, VGroup, arrange ...)
+which dense MiniLM embeddings tend to miss. Stored as a self-contained JSON file.
+"""
+
+import re
+import json
+import math
+from pathlib import Path
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+INDEX_VERSION = 1
+
+# Words that appear in nearly every syntax question and carry no retrieval signal
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how",
+    "i", "in", "into", "is", "it", "of", "on", "or", "the", "this", "to", "use", "using", "what",
+    "when", "which", "with", "manim", "you", "your"
+}
+
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase terms. Identifiers are kept whole and also split into their
+    snake_case / CamelCase parts, so "next_to" matches "next_to" and "next to",
+    and "MathTex" matches "mathtex" as well as "tex".
+    """
+    terms = []
+    for identifier in _IDENTIFIER_RE.findall(text):
+        lowered = identifier.lower()
+        parts = [part.lower() for chunk in identifier.split("_") for part in _CAMEL_RE.findall(chunk)]
+        if lowered not in STOPWORDS and len(lowered) > 1:
+            terms.append(lowered)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part not in STOPWORDS and len(part) > 1)
+    return terms
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed list of chunks with a precomputed inverted index.
+    """
+
+    def __init__(
+        self,
+        chunks: List[Dict[str, Any]],
+        postings: Dict[str, List[Tuple[int, int]]],
+        doc_lengths: List[int],
+        k1: float = 1.5,
+        b: float = 0.75
+    ):
+        self.chunks = chunks
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        n_docs = len(doc_lengths)
+        self.avg_doc_length = (sum(doc_lengths) / n_docs) if n_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in postings.items()
+        }
+
+    @classmethod
+    def build(cls, texts: Sequence[str], metadatas: Optional[Sequence[Dict[str, Any]]] = None) -> "BM25Index":
+        """
+        Index the given chunks. Repeated chunk texts are indexed once.
+        """
+        metadatas = metadatas or [{} for _ in texts]
+        unique = list({text: metadata for text, metadata in zip(texts, metadatas)}.items())
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lengths = []
+        for doc_id, (text, _) in enumerate(unique):
+            counts = Counter(tokenize(text))
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+        chunks = [{"text": text, "metadata": metadata or {}} for text, metadata in unique]
+        return cls(chunks, postings, doc_lengths)
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": INDEX_VERSION,
+                "k1": self.k1,
+                "b": self.b,
+                "chunks": self.chunks,
+                "doc_lengths": self.doc_lengths,
+                "postings": self.postings
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported BM25 index version: {data.get('version')}")
+        postings = {term: [tuple(entry) for entry in docs] for term, docs in data["postings"].items()}
+        return cls(data["chunks"], postings, data["doc_lengths"], data["k1"], data["b"])
+
+    def score(self, query: str) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = self.idf[term]
+            for doc_id, tf in docs:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_doc_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query: str, k: int = 4) -> List[Document]:
+        """
+        Top-k chunks by BM25 score (chunks sharing no term with the query are never returned).
+        """
+        scores = self.score(query)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [
+            Document(page_content=self.chunks[doc_id]["text"], metadata=self.chunks[doc_id].get("metadata") or {})
+            for doc_id, _ in ranked
+        ]
+
+    def __len__(self) -> int:
+        return len(self.chunks)
@@ -0,0 +1,148 @@
+"""
+LLM Response Cache
+Persistent SQLite cache of LLM responses keyed on (model, temperature, system prompt hash, user content),
+with TTL and size-based eviction, per-stage switches and hit-rate metrics.
+"""
+
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    On-disk cache of LLM responses for the prompt stages of the pipeline.
+    Stages not listed in `enabled_stages` always miss and are never stored.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        ttl_seconds: int = 7 * 24 * 3600,
+        max_entries: int = 5000,
+        enabled_stages: Optional[Iterable[str]] = None
+    ):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled_stages = set(enabled_stages) if enabled_stages is not None else None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache (last_access)")
+        self._conn.commit()
+        self._stage_stats: Dict[str, Dict[str, int]] = {}
+
+    def is_enabled(self, stage: str) -> bool:
+        return self.enabled_stages is None or stage in self.enabled_stages
+
+    @staticmethod
+    def make_key(model: str, temperature: Any, system_prompt: str, user_content: str) -> str:
+        return sha256_text("\0".join([
+            str(model),
+            str(temperature),
+            sha256_text(system_prompt),
+            user_content
+        ]))
+
+    def _record(self, stage: str, outcome: str) -> None:
+        stats = self._stage_stats.setdefault(stage, {"hits": 0, "misses": 0})
+        stats[outcome] += 1
+
+    def get(self, stage: str, key: str) -> Optional[str]:
+        """
+        Return the cached response, or None on a miss, expired entry or disabled stage.
+        """
+        if not self.is_enabled(stage):
+            return None
+
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] <= self.ttl_seconds:
+                self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self._record(stage, "hits")
+                return row[0]
+
+            if row is not None:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+            self._record(stage, "misses")
+            return None
+
+    def put(self, stage: str, key: str, model: str, response: str) -> None:
+        if not self.is_enabled(stage):
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, stage, model, response, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, stage, model, response, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        """
+        Drop an entry, e.g. when the cached response turned out to produce broken code.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                (excess,)
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        stages = {}
+        for stage, counts in self._stage_stats.items():
+            lookups = counts["hits"] + counts["misses"]
+            stages[stage] = {
+                **counts,
+                "hit_rate": round(counts["hits"] / lookups, 3) if lookups else 0.0
+            }
+        hits = sum(c["hits"] for c in self._stage_stats.values())
+        lookups = hits + sum(c["misses"] for c in self._stage_stats.values())
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "enabled_stages": sorted(self.enabled_stages) if self.enabled_stages is not None else "all",
+            "hits": hits,
+            "misses": lookups - hits,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "stages": stages
+        }
@@ -0,0 +1,186 @@
+"""
+Manim API index
+Names exported by `from manim import *` with their kind, constructor keyword arguments
+and public methods, built once from the installed manim package and cached as JSON.
+Building imports manim, so it runs in a subprocess to keep the backend process light:
+
+    python manim_api_index.py --output ../cache/manim_api_index.json
+"""
+
+import sys
+import json
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+INDEX_VERSION = 1
+
+
+def installed_manim_version() -> str:
+    try:
+        from importlib.metadata import version
+        return version("manim")
+    except Exception:
+        return "unknown"
+
+
+# ============================================================================
+# Building (runs with manim imported)
+# ============================================================================
+def _signature_info(func) -> Dict[str, Any]:
+    """
+    Keyword-capable parameter names of a callable; params is None when the signature is unknown.
+    """
+    import inspect
+
+    try:
+        signature = inspect.signature(func)
+    except (TypeError, ValueError):
+        return {"params": None, "varkw": True}
+    params = [
+        name for name, param in signature.parameters.items()
+        if param.kind in (param.POSITIONAL_OR_KEYWORD, param.KEYWORD_ONLY) and name != "self"
+    ]
+    varkw = any(param.kind == param.VAR_KEYWORD for param in signature.parameters.values())
+    return {"params": params, "varkw": varkw}
+
+
+def _constructor_info(cls) -> Dict[str, Any]:
+    """
+    Keyword arguments accepted by cls(...): the union of __init__ parameters along the MRO
+    for as long as each __init__ forwards **kwargs to its parent.
+    """
+    params: List[str] = []
+    for klass in cls.__mro__:
+        if klass is object:
+            break
+        if "__init__" not in klass.__dict__:
+            continue
+        info = _signature_info(klass.__dict__["__init__"])
+        if info["params"] is None:
+            return {"params": None, "varkw": True}
+        params.extend(name for name in info["params"] if name not in params)
+        if not info["varkw"]:
+            return {"params": params, "varkw": False}
+    return {"params": params, "varkw": True}
+
+
+def _describe(obj) -> Dict[str, Any]:
+    import inspect
+
+    if inspect.ismodule(obj):
+        return {"kind": "module"}
+    if inspect.isclass(obj):
+        methods = {}
+        attributes = []
+        for name in dir(obj):
+            if name.startswith("_"):
+                continue
+            try:
+                member = inspect.getattr_static(obj, name)
+            except AttributeError:
+                continue
+            if isinstance(member, (staticmethod, classmethod)):
+                member = member.__func__
+            if inspect.isfunction(member) or inspect.ismethoddescriptor(member):
+                methods[name] = _signature_info(member)
+            else:
+                attributes.append(name)
+        return {
+            "kind": "class",
+            "init": _constructor_info(obj),
+            "methods": methods,
+            "attributes": attributes,
+            # Mobject.__getattr__ synthesizes get_<attr> / set_<attr>
+            "dynamic_getattr": any("__getattr__" in klass.__dict__ for klass in obj.__mro__ if klass is not object)
+        }
+    if callable(obj):
+        return {"kind": "function", **_signature_info(obj)}
+    return {"kind": "constant"}
+
+
+def build_index() -> Dict[str, Any]:
+    import manim
+
+    exported = getattr(manim, "__all__", None) or [name for name in dir(manim) if not name.startswith("_")]
+    return {
+        "version": INDEX_VERSION,
+        "manim_version": installed_manim_version(),
+        "names": {name: _describe(getattr(manim, name)) for name in exported if hasattr(manim, name)}
+    }
+
+
+# ============================================================================
+# Loading (backend process)
+# ============================================================================
+class ManimApiIndex:
+    """
+    Read-only view of the index used by the pre-flight checker.
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        self.manim_version = data["manim_version"]
+        self.names: Dict[str, Dict[str, Any]] = data["names"]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.names
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def get_class(self, name: str) -> Optional[Dict[str, Any]]:
+        entry = self.names.get(name)
+        return entry if entry and entry["kind"] == "class" else None
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["ManimApiIndex"]:
+        """
+        The cached index, or None if it is missing, outdated or built for another manim version.
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != INDEX_VERSION or data.get("manim_version") != installed_manim_version():
+            return None
+        return cls(data)
+
+    @classmethod
+    def load_or_build(cls, path: Path, timeout: int = 300) -> "ManimApiIndex":
+        """
+        Load the cached index, rebuilding it in a subprocess when needed.
+        """
+        path = Path(path)
+        index = cls.load(path)
+        if index is not None:
+            return index
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        result = subprocess.run(
+            [sys.executable, str(Path(__file__).resolve()), "--output", str(path)],
+            capture_output=True,
+            text=True,
+            timeout=timeout
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Building the manim API index failed: {result.stderr.strip()[-500:]}")
+        index = cls.load(path)
+        if index is None:
+            raise RuntimeError("Building the manim API index produced no usable file")
+        return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index the API exported by `from manim import *`")
+    parser.add_argument("--output", type=Path, required=True, help="Where to write the JSON index")
+    args = parser.parse_args()
+
+    index = build_index()
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = args.output.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    tmp_path.replace(args.output)
+    print(f"✓ Indexed {len(index['names'])} names from manim {index['manim_version']}")
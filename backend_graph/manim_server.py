@@ -0,0 +1,313 @@
+"""
+Manim fork server
+A long-lived process that imports manim once and forks a child per render, so renders
+skip interpreter startup and `import manim` (numpy, scipy, cairo, pango ...). Each job
+runs the regular manim CLI (same flags, scene names and media/ output paths) in its own
+forked process, which keeps jobs isolated and killable on timeout.
+
+Protocol (Unix socket, one connection per job):
+    client -> {"args": ["-ql", "scene.py", "Scene1"], "cwd": "..."}\\n
+    server -> {"pid": <render process>}\\n
+    server -> {"returncode": int, "stdout": str, "stderr": str}   (then closes)
+
+Readiness check (the socket only exists once manim has been imported):
+    client -> {"ping": true}\\n
+    server -> {"ready": true}\\n
+
+Benchmark against the subprocess path:
+    python manim_server.py benchmark scene.py Scene1 --runs 3 --flags=-ql
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import asyncio
+import argparse
+import tempfile
+import traceback
+import subprocess
+from pathlib import Path
+from typing import List, Optional
+
+
+def fork_server_supported() -> bool:
+    return hasattr(os, "fork") and hasattr(socket, "AF_UNIX")
+
+
+# ============================================================================
+# Server
+# ============================================================================
+def _read_request(conn: socket.socket) -> dict:
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    return json.loads(data)
+
+
+def _send(conn: socket.socket, message: dict) -> None:
+    conn.sendall((json.dumps(message) + "\n").encode("utf-8"))
+
+
+def _run_job(conn: socket.socket, manim_main) -> None:
+    """
+    Runs in a forked child of the server: forks the render process, reports its pid,
+    waits for it and sends back its exit code and output.
+    """
+    request = _read_request(conn)
+    if request.get("ping"):
+        _send(conn, {"ready": True})
+        return
+
+    stdout_file = tempfile.TemporaryFile()
+    stderr_file = tempfile.TemporaryFile()
+
+    pid = os.fork()
+    if pid == 0:
+        # Render process: the manim CLI, in-process, with output going to the temp files
+        conn.close()
+        os.dup2(stdout_file.fileno(), 1)
+        os.dup2(stderr_file.fileno(), 2)
+        code = 1
+        try:
+            os.chdir(request["cwd"])
+            sys.argv = ["manim", *request["args"]]
+            manim_main(args=["render", *request["args"]], prog_name="manim")
+            code = 0
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    _send(conn, {"pid": pid})
+    _, status = os.waitpid(pid, 0)
+
+    outputs = []
+    for output_file in (stdout_file, stderr_file):
+        output_file.seek(0)
+        outputs.append(output_file.read().decode("utf-8", errors="replace"))
+    try:
+        _send(conn, {
+            "returncode": os.waitstatus_to_exitcode(status),
+            "stdout": outputs[0],
+            "stderr": outputs[1]
+        })
+    except OSError:
+        # The client gave up (timeout) - nobody is waiting for the result
+        pass
+
+
+def serve(socket_path: str, parent_pid: Optional[int] = None) -> None:
+    """
+    Import manim, then accept jobs until the parent process goes away.
+    """
+    # BLAS thread pools don't survive fork(); manim's small matrices don't need them
+    for variable in ("OPENBLAS_NUM_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(variable, "1")
+
+    # Imported once here and shared copy-on-write by every forked job
+    import manim  # noqa: F401
+    from manim.__main__ import main as manim_main
+
+    # Job processes are reaped automatically
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(64)
+    server.settimeout(5)
+
+    try:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                if parent_pid is not None and os.getppid() != parent_pid:
+                    break
+                continue
+
+            conn.settimeout(None)
+            if os.fork() == 0:
+                server.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                try:
+                    _run_job(conn, manim_main)
+                finally:
+                    os._exit(0)
+            conn.close()
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+# ============================================================================
+# Client
+# ============================================================================
+class ForkServerClient:
+    """
+    Starts the fork server and runs manim CLI arguments on it.
+    `run` mirrors run_manim: returns subprocess.CompletedProcess and raises
+    subprocess.TimeoutExpired after killing the render process (which is also
+    killed when the caller is cancelled).
+    """
+
+    def __init__(self, socket_path: Optional[str] = None):
+        self.socket_path = socket_path or str(Path(tempfile.gettempdir()) / f"manim_fork_{os.getpid()}.sock")
+        self.process: Optional[subprocess.Popen] = None
+        self.jobs = 0
+        self.restarts = 0
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def _ping(self) -> bool:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+                conn.settimeout(5)
+                conn.connect(self.socket_path)
+                _send(conn, {"ping": True})
+                return json.loads(conn.makefile("rb").readline()).get("ready") is True
+        except (OSError, ValueError):
+            return False
+
+    def start(self, timeout: float = 120) -> None:
+        """
+        Launch the server and block until manim is imported and the socket answers a ping.
+        Output printed by the server (e.g. import warnings) is discarded.
+        """
+        if self.process is not None:
+            self.restarts += 1
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.process = subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), "serve",
+             "--socket", self.socket_path, "--parent-pid", str(os.getpid())],
+            stdout=subprocess.DEVNULL
+        )
+
+        deadline = time.monotonic() + timeout
+        while not (os.path.exists(self.socket_path) and self._ping()):
+            if self.process.poll() is not None:
+                raise RuntimeError(f"manim fork server exited during startup (code {self.process.returncode})")
+            if time.monotonic() > deadline:
+                self.process.kill()
+                self.process.wait()
+                raise RuntimeError(f"manim fork server did not become ready within {timeout} seconds")
+            time.sleep(0.05)
+
+    def stop(self) -> None:
+        if self.alive():
+            self.process.terminate()
+            self.process.wait()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    @staticmethod
+    def _kill(pid: int) -> None:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    async def run(self, args: List[str], timeout: float) -> subprocess.CompletedProcess:
+        if not self.alive():
+            await asyncio.to_thread(self.start)
+
+        command = ["manim", *args]
+        reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        try:
+            writer.write((json.dumps({"args": args, "cwd": os.getcwd()}) + "\n").encode("utf-8"))
+            await writer.drain()
+
+            header = await reader.readline()
+            if not header:
+                raise ConnectionError("manim fork server closed the connection")
+            pid = json.loads(header)["pid"]
+            self.jobs += 1
+
+            try:
+                body = await asyncio.wait_for(reader.read(), timeout=timeout)
+            except asyncio.TimeoutError:
+                self._kill(pid)
+                raise subprocess.TimeoutExpired(command, timeout)
+            except asyncio.CancelledError:
+                self._kill(pid)
+                raise
+            if not body:
+                raise ConnectionError("manim fork server closed the connection")
+
+            result = json.loads(body)
+            return subprocess.CompletedProcess(command, result["returncode"], result["stdout"], result["stderr"])
+        finally:
+            writer.close()
+
+    def stats(self) -> dict:
+        return {"alive": self.alive(), "jobs": self.jobs, "restarts": self.restarts}
+
+
+# ============================================================================
+# Benchmark
+# ============================================================================
+async def benchmark(scene_file: str, scene_name: str, runs: int, flags: List[str]) -> None:
+    """
+    Time the same render through a fresh manim subprocess and through the fork server.
+    """
+    args = [*flags, scene_file, scene_name]
+    timings = {"subprocess": [], "fork_server": []}
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(["manim", *args], capture_output=True, text=True)
+        timings["subprocess"].append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise SystemExit(f"✗ Subprocess render failed:\n{result.stderr}")
+
+    client = ForkServerClient()
+    start = time.perf_counter()
+    await asyncio.to_thread(client.start)
+    print(f"Fork server started in {time.perf_counter() - start:.2f}s (one-off)")
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = await client.run(args, timeout=600)
+            timings["fork_server"].append(time.perf_counter() - start)
+            if result.returncode != 0:
+                raise SystemExit(f"✗ Fork server render failed:\n{result.stderr}")
+    finally:
+        client.stop()
+
+    for path, seconds in timings.items():
+        print(f"  {path:<12} mean {sum(seconds) / len(seconds):6.2f}s   min {min(seconds):6.2f}s   ({runs} runs)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manim fork server")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Run the server (started by the backend)")
+    serve_parser.add_argument("--socket", required=True, help="Unix socket path")
+    serve_parser.add_argument("--parent-pid", type=int, default=None, help="Exit when this process goes away")
+
+    benchmark_parser = commands.add_parser("benchmark", help="Compare against the subprocess render path")
+    benchmark_parser.add_argument("scene_file")
+    benchmark_parser.add_argument("scene_name", nargs="?", default="Scene1")
+    benchmark_parser.add_argument("--runs", type=int, default=3)
+    benchmark_parser.add_argument("--flags", default="-ql", help="Manim flags, e.g. --flags=\"-qm\" (default: -ql)")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args.socket, args.parent_pid)
+    else:
+        asyncio.run(benchmark(args.scene_file, args.scene_name, args.runs, args.flags.split()))
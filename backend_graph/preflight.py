@@ -0,0 +1,199 @@
+"""
+Pre-flight checks for generated Manim code
+Resolves the names, constructor keyword arguments and method calls in the code's AST
+against the Manim API index, so NameError / AttributeError / TypeError failures are found
+without launching a manim render. Checks are conservative: anything that can't be
+resolved statically is assumed to be fine.
+"""
+
+import ast
+import math
+import builtins
+from typing import Dict, List, Optional, Set, Tuple
+
+from manim_api_index import ManimApiIndex
+
+# Names that exist at module level without being defined or imported
+MODULE_GLOBALS = {"__name__", "__file__", "__doc__", "__builtins__", "__spec__", "__loader__", "__package__"}
+
+# Modules whose star import the index (or the math module) accounts for
+KNOWN_STAR_IMPORTS = {"manim", "math"}
+
+MAX_ISSUES = 10
+
+
+def _defined_names(tree: ast.AST) -> Set[str]:
+    """
+    Every name the code binds anywhere (scopes are not distinguished).
+    """
+    names: Set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name != "*":
+                    names.add((alias.asname or alias.name).split(".")[0])
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+        elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+            names.add(node.name)
+        elif isinstance(node, ast.MatchMapping) and node.rest:
+            names.add(node.rest)
+    return names
+
+
+def _variable_classes(tree: ast.AST, index: ManimApiIndex) -> Dict[str, str]:
+    """
+    Variables that are only ever assigned an instance of one indexed Manim class (x = Circle(...)).
+    """
+    assigned: Dict[str, Set[Optional[str]]] = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign):
+            value = node.value
+            cls = None
+            if isinstance(value, ast.Call) and isinstance(value.func, ast.Name) and index.get_class(value.func.id):
+                cls = value.func.id
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    assigned.setdefault(target.id, set()).add(cls)
+                else:
+                    for name in ast.walk(target):
+                        if isinstance(name, ast.Name):
+                            assigned.setdefault(name.id, set()).add(None)
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            # Loop targets, augmented assignments, walrus, ... - type unknown
+            assigned.setdefault(node.id, set())
+        elif isinstance(node, ast.arg):
+            assigned.setdefault(node.arg, set()).add(None)
+
+    # Names bound by anything other than a plain assignment got an empty set above
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.For, ast.AsyncFor, ast.comprehension, ast.AugAssign, ast.AnnAssign, ast.NamedExpr, ast.withitem)):
+            target = getattr(node, "target", None) or getattr(node, "optional_vars", None)
+            for name in ast.walk(target) if target is not None else ():
+                if isinstance(name, ast.Name):
+                    assigned.setdefault(name.id, set()).add(None)
+
+    return {
+        name: next(iter(classes))
+        for name, classes in assigned.items()
+        if len(classes) == 1 and None not in classes
+    }
+
+
+def _self_attributes(cls_node: ast.ClassDef) -> Set[str]:
+    """
+    Methods defined on the scene class and attributes assigned to self.
+    """
+    names = set()
+    for node in ast.walk(cls_node):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            names.add(node.name)
+        elif (isinstance(node, ast.Attribute) and isinstance(node.ctx, ast.Store)
+              and isinstance(node.value, ast.Name) and node.value.id == "self"):
+            names.add(node.attr)
+    return names
+
+
+class _Checker:
+    def __init__(self, tree: ast.Module, index: ManimApiIndex):
+        self.tree = tree
+        self.index = index
+        self.issues: List[Tuple[int, str]] = []
+
+    def report(self, node: ast.AST, message: str) -> None:
+        issue = (node.lineno, message)
+        if issue not in self.issues:
+            self.issues.append(issue)
+
+    def check_kwargs(self, call: ast.Call, signature: Dict, label: str) -> None:
+        if signature.get("params") is None or signature.get("varkw"):
+            return
+        for keyword in call.keywords:
+            if keyword.arg is not None and keyword.arg not in signature["params"]:
+                self.report(call, f"TypeError: {label}() got an unexpected keyword argument '{keyword.arg}'")
+
+    def check_method(self, node: ast.Attribute, call: Optional[ast.Call], class_name: str,
+                     type_label: str, extra: Set[str] = frozenset()) -> None:
+        cls = self.index.get_class(class_name)
+        attr = node.attr
+        if cls is None or attr in extra or attr in cls["attributes"]:
+            return
+        if cls["dynamic_getattr"] and attr.startswith(("get_", "set_")):
+            return
+        method = cls["methods"].get(attr)
+        if method is None:
+            self.report(node, f"AttributeError: '{type_label}' object has no attribute '{attr}'")
+        elif call is not None:
+            self.check_kwargs(call, method, f"{type_label}.{attr}")
+
+    def run(self) -> List[str]:
+        defined = _defined_names(self.tree)
+        star_imports = {
+            node.module for node in ast.walk(self.tree)
+            if isinstance(node, ast.ImportFrom) and any(alias.name == "*" for alias in node.names)
+        }
+        check_names = star_imports <= KNOWN_STAR_IMPORTS
+        known = defined | set(self.index.names) | set(dir(builtins)) | MODULE_GLOBALS
+        if "math" in star_imports:
+            known |= {name for name in dir(math) if not name.startswith("_")}
+
+        variable_classes = _variable_classes(self.tree, self.index)
+
+        # Scene classes: self.<method>() is resolved against their Manim base class
+        scene_bases: Dict[ast.ClassDef, str] = {}
+        for node in self.tree.body:
+            if isinstance(node, ast.ClassDef):
+                bases = [base.id for base in node.bases if isinstance(base, ast.Name) and self.index.get_class(base.id)]
+                if len(bases) == 1 and len(node.bases) == 1:
+                    scene_bases[node] = bases[0]
+
+        # Map each Attribute node to the call it is the function of
+        calls = {id(node.func): node for node in ast.walk(self.tree) if isinstance(node, ast.Call)}
+
+        for node in ast.walk(self.tree):
+            if check_names and isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+                if node.id not in known:
+                    self.report(node, f"NameError: name '{node.id}' is not defined")
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id not in defined:
+                entry = self.index.names.get(node.func.id)
+                if entry is not None and entry["kind"] == "class":
+                    self.check_kwargs(node, entry["init"], node.func.id)
+                elif entry is not None and entry["kind"] == "function":
+                    self.check_kwargs(node, entry, node.func.id)
+            elif isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and isinstance(node.ctx, ast.Load):
+                call = calls.get(id(node))
+                name = node.value.id
+                if name in variable_classes and call is not None:
+                    # Only calls are checked - instance attributes set in __init__ are not in the index
+                    self.check_method(node, call, variable_classes[name], variable_classes[name])
+
+        for cls_node, base in scene_bases.items():
+            own = _self_attributes(cls_node)
+            for node in ast.walk(cls_node):
+                if (isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name)
+                        and node.value.id == "self" and isinstance(node.ctx, ast.Load)):
+                    call = calls.get(id(node))
+                    if call is not None:
+                        self.check_method(node, call, base, cls_node.name, own)
+
+        return [f"Line {line}: {message}" for line, message in sorted(self.issues)[:MAX_ISSUES]]
+
+
+def check_code(code: str, index: ManimApiIndex) -> List[str]:
+    """
+    Problems that would make the code fail when rendered, as Python-style error messages
+    with line numbers. An empty list means nothing was found.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return [f"Line {e.lineno}: SyntaxError: {e.msg}"]
+    return _Checker(tree, index).run()
@@ -72,6 +72,37 @@ Return ONLY a numbered list of questions, nothing else.
 """
 
 
+# ============================================================================
+# FUSED PLANNING PROMPT (story + syntax questions in one call)
+# ============================================================================
+PLANNING_PROMPT = """
+You are an expert educational content creator and Manim expert planning an animation in ONE step.
+
+Given a user query, produce BOTH:
+1. "story": a clear, visual narrative for a Manim animation
+2. "questions": 5-6 specific Manim syntax questions for documentation lookup
+
+STORY REQUIREMENTS:
+- Divide the story into 3-5 distinct "phases" (Phase 1: ..., Phase 2: ...)
+- Each phase should: introduce elements → demonstrate → transition/cleanup
+- Explicitly mention when previous elements should DISAPPEAR or FADE OUT
+- Avoid having more than 3-4 major elements visible at once
+- Be specific about positioning (top, center, left, right, below)
+- Keep total animation length reasonable (15-30 seconds)
+
+QUESTION REQUIREMENTS:
+- Ask how to create the specific Manim objects and animations the story needs
+- Name the Manim classes and methods explicitly (e.g. Transform, next_to, VGroup.arrange)
+- ALWAYS include a question about positioning/arrangement
+- ALWAYS include a question about FadeOut/removing objects
+- Keep questions concise and searchable
+
+OUTPUT FORMAT:
+Return ONLY a JSON object, no markdown and no extra text:
+{"story": "Phase 1: ... Phase 2: ...", "questions": ["How to ...?", "How to ...?"]}
+"""
+
+
 # ============================================================================
 # CODE GENERATION PROMPT
 # ============================================================================
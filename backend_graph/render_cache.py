@@ -0,0 +1,146 @@
+"""
+Render Cache
+Content-addressed cache of rendered videos keyed on (normalized code, scene, quality flags, manim version),
+with size-bounded LRU eviction. Entries live as plain files so the cache survives restarts.
+"""
+
+import os
+import shutil
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence
+
+
+def get_manim_version() -> str:
+    """
+    Installed manim version (part of the cache key - a new manim may render differently).
+    """
+    try:
+        from importlib.metadata import version
+        return version("manim")
+    except Exception:
+        return "unknown"
+
+
+def normalize_code(code: str) -> str:
+    """
+    Normalize code so cosmetic differences (line endings, trailing whitespace) share a cache entry.
+    """
+    lines = code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip() + "\n"
+
+
+def link_or_copy(src: Path, dst: Path) -> None:
+    """
+    Hard-link src to dst, falling back to a copy across filesystems.
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class RenderCache:
+    """
+    LRU cache of rendered mp4 files stored as `<cache_dir>/animation_<key>.mp4`.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int, manim_version: Optional[str] = None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.manim_version = manim_version or get_manim_version()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> size in bytes, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._load()
+
+    def _load(self) -> None:
+        """
+        Rebuild the LRU order from the files on disk (mtime is refreshed on every hit).
+        """
+        files = sorted(self.cache_dir.glob("animation_*.mp4"), key=lambda p: p.stat().st_mtime)
+        for path in files:
+            key = path.stem[len("animation_"):]
+            size = path.stat().st_size
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def make_key(self, code: str, scene_name: str, quality_flags: Sequence[str]) -> str:
+        payload = "\0".join([
+            normalize_code(code),
+            scene_name,
+            " ".join(quality_flags),
+            self.manim_version
+        ])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        return self.cache_dir / f"animation_{key}.mp4"
+
+    def get(self, key: str) -> Optional[Path]:
+        """
+        Return the cached video for `key`, or None on a miss.
+        """
+        with self._lock:
+            path = self.path_for(key)
+            if key in self._entries and path.exists():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                return path
+
+            if key in self._entries:
+                # File was removed behind our back
+                self._total_bytes -= self._entries.pop(key)
+            self.misses += 1
+            return None
+
+    def put(self, key: str, video_path: Path) -> Path:
+        """
+        Store a rendered video under `key` (hard-linked when possible) and evict old entries.
+        """
+        with self._lock:
+            path = self.path_for(key)
+            if key not in self._entries:
+                if not path.exists():
+                    link_or_copy(Path(video_path), path)
+                size = path.stat().st_size
+                self._entries[key] = size
+                self._total_bytes += size
+            self._entries.move_to_end(key)
+            self._evict()
+            return path
+
+    def _evict(self) -> None:
+        # Always keep the most recent entry, even if it alone exceeds the budget
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                self.path_for(key).unlink()
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "manim_version": self.manim_version
+        }
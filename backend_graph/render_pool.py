@@ -0,0 +1,122 @@
+"""
+Render Scheduler
+Bounded pool of render workers with a priority queue, so concurrent manim renders
+do not oversubscribe the CPU. Interactive editor renders are served before batch renders.
+"""
+
+import os
+import time
+import asyncio
+import itertools
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0   # Editor /render re-renders
+PRIORITY_GENERATE = 10     # Renders inside the /generate pipeline
+PRIORITY_UPGRADE = 20      # Background re-renders of finished videos at a higher quality
+
+
+class RenderScheduler:
+    """
+    Runs render coroutines on a fixed number of workers, ordered by (priority, arrival).
+
+    Workers are started lazily on the first submit so the scheduler can be created
+    at import time, before an event loop exists.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._worker_tasks = []
+        self._sequence = itertools.count()
+
+        # Metrics
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+        self._queued_by_priority: Dict[int, int] = {}
+
+    def _ensure_started(self) -> None:
+        if self._queue is not None:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        print(f"✓ Render scheduler started with {self.workers} workers")
+
+    async def submit(self, render: Callable[[], Awaitable[Any]], priority: int = PRIORITY_GENERATE) -> Any:
+        """
+        Queue `render()` and wait for its result. Exceptions raised by the render
+        are propagated to the caller; cancelling the caller cancels the render.
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self.submitted += 1
+        self._queued_by_priority[priority] = self._queued_by_priority.get(priority, 0) + 1
+        await self._queue.put((priority, next(self._sequence), time.perf_counter(), render, future))
+        return await future
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            priority, _, enqueued_at, render, future = await self._queue.get()
+            self._queued_by_priority[priority] -= 1
+            try:
+                # The caller went away while the job was queued
+                if future.cancelled():
+                    continue
+
+                wait = time.perf_counter() - enqueued_at
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+                if wait > 1:
+                    print(f"  Render waited {wait:.1f}s in queue (priority {priority}, worker {index})")
+
+                self.in_flight += 1
+                start = time.perf_counter()
+                # A caller that gives up mid-render (e.g. a losing fix candidate) cancels the render too
+                task = asyncio.ensure_future(render())
+                future.add_done_callback(lambda f, task=task: task.cancel() if f.cancelled() else None)
+                try:
+                    result = await task
+                except asyncio.CancelledError:
+                    self.cancelled += 1
+                except Exception as e:
+                    self.failed += 1
+                    if not future.cancelled():
+                        future.set_exception(e)
+                else:
+                    self.completed += 1
+                    if not future.cancelled():
+                        future.set_result(result)
+                finally:
+                    self.in_flight -= 1
+                    self.total_run += time.perf_counter() - start
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Queue depth, utilisation and wait-time metrics.
+        """
+        started = self.completed + self.failed + self.cancelled
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_depth_by_priority": {
+                str(priority): count for priority, count in sorted(self._queued_by_priority.items()) if count
+            },
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "avg_wait_seconds": round(self.total_wait / started, 3) if started else 0.0,
+            "max_wait_seconds": round(self.max_wait, 3),
+            "avg_run_seconds": round(self.total_run / started, 3) if started else 0.0
+        }
@@ -0,0 +1,174 @@
+"""
+Retrieval helpers for the RAG node
+Batched, cached query embeddings, multi-query vector store lookups and the local
+keyword extraction used for speculative retrieval on the raw user query.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper with an LRU cache keyed on the exact text.
+    Cache misses of a batch are embedded together in a single forward pass.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_size: int = 1024):
+        self.embeddings = embeddings
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: Dict[str, List[float]] = {}
+        missing: List[str] = []
+        with self._lock:
+            for text in texts:
+                if text in vectors or text in missing:
+                    continue
+                if text in self._cache:
+                    self._cache.move_to_end(text)
+                    vectors[text] = self._cache[text]
+                else:
+                    missing.append(text)
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            new_vectors = self.embeddings.embed_documents(missing)
+            vectors.update(zip(missing, new_vectors))
+            with self._lock:
+                for text, vector in zip(missing, new_vectors):
+                    self._cache[text] = vector
+                while len(self._cache) > self.max_size:
+                    self._cache.popitem(last=False)
+
+        return [vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+
+def batch_similarity_search(vectorstore: Any, embeddings: Embeddings, queries: List[str], k: int = 2) -> List[List[Document]]:
+    """
+    Top-k documents for every query using one batched embedding call and one store lookup.
+
+    Uses the store's own `batch_similarity_search_by_vector` when it has one, a single
+    multi-query Chroma collection query otherwise, and falls back to per-query vector search.
+    """
+    if not queries:
+        return []
+
+    query_vectors = embeddings.embed_documents(queries)
+
+    if hasattr(vectorstore, "batch_similarity_search_by_vector"):
+        return vectorstore.batch_similarity_search_by_vector(query_vectors, k=k)
+
+    collection = getattr(vectorstore, "_collection", None)
+    if collection is not None:
+        results = collection.query(
+            query_embeddings=query_vectors,
+            n_results=k,
+            include=["documents", "metadatas"]
+        )
+        batches = []
+        for texts, metadatas in zip(results["documents"], results["metadatas"]):
+            batches.append([
+                Document(page_content=text, metadata=metadata or {})
+                for text, metadata in zip(texts, metadatas or [None] * len(texts))
+            ])
+        return batches
+
+    return [vectorstore.similarity_search_by_vector(vector, k=k) for vector in query_vectors]
+
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Document]], k: int, rrf_k: int = 60) -> List[Document]:
+    """
+    Merge several rankings with Reciprocal Rank Fusion: score(d) = sum(1 / (rrf_k + rank)).
+    Documents are identified by their text, so the same chunk from two retrievers is merged.
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in ranked_lists:
+        for rank, doc in enumerate(ranking, 1):
+            scores[doc.page_content] = scores.get(doc.page_content, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(doc.page_content, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[text] for text in ranked]
+
+
+def hybrid_search(
+    vectorstore: Any,
+    embeddings: Embeddings,
+    lexical_index: Any,
+    queries: List[str],
+    k: int = 2,
+    candidates: int = 8
+) -> List[List[Document]]:
+    """
+    Top-k documents per query fused from dense (embedding) and lexical (BM25) rankings.
+    Each retriever contributes its top `candidates` documents to the fusion.
+    """
+    dense_results = batch_similarity_search(vectorstore, embeddings, queries, candidates)
+    return [
+        reciprocal_rank_fusion([dense_docs, lexical_index.search(query, candidates)], k)
+        for query, dense_docs in zip(queries, dense_results)
+    ]
+
+
+# Everyday words in user queries -> the Manim API they usually end up needing
+KEYWORD_API_HINTS = {
+    "graph": ["Axes", "plot"], "plot": ["Axes", "plot"], "function": ["Axes", "plot"],
+    "curve": ["Axes", "plot"], "parabola": ["Axes", "plot"], "sine": ["Axes", "plot"],
+    "equation": ["MathTex"], "formula": ["MathTex"], "theorem": ["MathTex"], "proof": ["MathTex"],
+    "text": ["Text"], "title": ["Text"], "label": ["Text", "next_to"],
+    "array": ["VGroup", "arrange"], "list": ["VGroup", "arrange"], "sort": ["VGroup", "arrange", "Swap"],
+    "sorting": ["VGroup", "arrange", "Swap"], "stack": ["VGroup", "arrange"], "queue": ["VGroup", "arrange"],
+    "swap": ["Swap", "animate"], "move": ["animate", "move_to"],
+    "circle": ["Circle"], "square": ["Square"], "rectangle": ["Rectangle"],
+    "triangle": ["Polygon"], "polygon": ["Polygon"], "angle": ["Angle"],
+    "arrow": ["Arrow"], "vector": ["Arrow"], "line": ["Line"], "dot": ["Dot"], "point": ["Dot"],
+    "matrix": ["Matrix"], "table": ["Table"], "brace": ["Brace"], "number": ["NumberLine"],
+    "tree": ["Graph"], "node": ["Graph"], "network": ["Graph"], "edge": ["Graph"],
+    "transform": ["Transform"], "morph": ["Transform"], "highlight": ["Indicate", "SurroundingRectangle"],
+    "rotate": ["Rotate"], "rotation": ["Rotate"], "color": ["set_color"], "fade": ["FadeIn", "FadeOut"],
+    "3d": ["ThreeDScene"], "sphere": ["ThreeDScene"], "cube": ["ThreeDScene"]
+}
+
+# Identifiers the user typed directly: CamelCase classes (VGroup, MathTex) or snake_case methods (next_to)
+_API_NAME_RE = re.compile(r"\b(?:[A-Z][a-z]+(?:[A-Z][A-Za-z]*)+|[A-Z]{2,}[a-z][A-Za-z]*|[a-z]+(?:_[a-z]+)+)\b")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def extract_api_queries(query: str, limit: int = 4) -> List[str]:
+    """
+    Retrieval queries for the Manim APIs a user query is likely to need, found without an LLM:
+    API names typed in the query first, then names mapped from keywords in KEYWORD_API_HINTS.
+    """
+    names: List[str] = []
+    for name in _API_NAME_RE.findall(query):
+        if name not in names:
+            names.append(name)
+    for word in _WORD_RE.findall(query.lower()):
+        for name in KEYWORD_API_HINTS.get(word.rstrip("s") if word not in KEYWORD_API_HINTS else word, []):
+            if name not in names:
+                names.append(name)
+    return [f"How to use {name} in Manim?" for name in names[:limit]]
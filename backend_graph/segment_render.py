@@ -0,0 +1,103 @@
+"""
+Segment-parallel rendering
+Splits one scene into ranges of animations (self.play / self.wait calls), renders each range
+in its own manim process with `-n start,end` and joins the resulting videos with ffmpeg's
+concat demuxer using stream copy. Manim renders the skipped animations without writing
+frames, so every segment starts from the same scene state as the serial render, and
+concatenating the segments equals concatenating all partial movie files - which is what
+manim does itself at the end of a serial render.
+"""
+
+import os
+import re
+import asyncio
+import subprocess
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# Logged by manim at the end of every render, including dry runs
+_PLAYED_RE = re.compile(r"Played\s+(\d+)\s+animations")
+
+# Features whose output depends on the whole timeline, not on individual animations
+SERIAL_ONLY_MARKERS = ("add_sound",)
+
+
+def count_played_animations(output: str) -> Optional[int]:
+    """
+    Number of animations a manim run reported, None if it did not report one.
+    """
+    matches = _PLAYED_RE.findall(output)
+    return int(matches[-1]) if matches else None
+
+
+def plan_segments(num_animations: int, max_segments: int, min_animations: int = 4) -> List[Tuple[int, int]]:
+    """
+    Split animations 0..num_animations-1 into at most max_segments inclusive ranges of at
+    least min_animations each, sized as evenly as possible. One range means: render serially.
+    """
+    if num_animations <= 0:
+        return [(0, max(num_animations - 1, 0))]
+    count = max(1, min(max_segments, num_animations // max(min_animations, 1)))
+    base, extra = divmod(num_animations, count)
+    ranges = []
+    start = 0
+    for i in range(count):
+        size = base + (1 if i < extra else 0)
+        ranges.append((start, start + size - 1))
+        start += size
+    return ranges
+
+
+def supports_segments(code: str) -> bool:
+    """
+    Whether the scene can be split without changing the output.
+    """
+    return not any(marker in code for marker in SERIAL_ONLY_MARKERS)
+
+
+def segment_flags(start: int, end: int, media_dir: Path) -> List[str]:
+    """
+    Manim flags that render only animations start..end (inclusive) into their own media
+    directory, so concurrent segments don't share partial movie files.
+    """
+    return ["-n", f"{start},{end}", "--media_dir", str(media_dir)]
+
+
+async def concat_videos(parts: List[Path], output_path: Path, timeout: int = 120) -> None:
+    """
+    Join videos with identical encoding settings without re-encoding.
+    Raises RuntimeError if ffmpeg fails and subprocess.TimeoutExpired on timeout.
+    """
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    list_path = output_path.with_suffix(".concat.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for part in parts:
+            escaped = str(Path(part).resolve()).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    args = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "concat", "-safe", "0", "-i", str(list_path),
+        "-c", "copy", str(output_path)
+    ]
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+        process.kill()
+        await process.wait()
+        if isinstance(e, asyncio.CancelledError):
+            raise
+        raise subprocess.TimeoutExpired(args, timeout)
+    finally:
+        try:
+            os.remove(list_path)
+        except OSError:
+            pass
+
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg concat failed: {stderr.decode('utf-8', errors='replace').strip()[-500:]}")
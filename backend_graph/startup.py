@@ -0,0 +1,76 @@
+"""
+Startup helpers
+Lazily created resources and per-phase timing of the backend's cold start.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Phase name -> seconds, in the order phases finished
+startup_timings: Dict[str, float] = {}
+
+
+@contextmanager
+def timed_phase(name: str):
+    """
+    Time a startup phase and record it in `startup_timings`.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        startup_timings[name] = round(elapsed, 3)
+        print(f"  ⏱ {name}: {elapsed:.2f}s")
+
+
+def format_timings() -> str:
+    total = sum(startup_timings.values())
+    lines = [f"    {name:<24} {seconds:>7.2f}s" for name, seconds in startup_timings.items()]
+    lines.append(f"    {'total':<24} {total:>7.2f}s")
+    return "\n".join(lines)
+
+
+class LazyResource(Generic[T]):
+    """
+    A resource that is built on first use (thread-safe) and then reused.
+    The factory may return None (e.g. an optional vector store that failed to load);
+    that result is cached as well.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self._factory = factory
+        self._value: Optional[T] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self) -> T:
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                with timed_phase(self.name):
+                    self._value = self._factory()
+                self._loaded = True
+        return self._value
+
+    def peek(self) -> Optional[T]:
+        """
+        The value if it has been built already, without triggering a load.
+        """
+        return self._value if self._loaded else None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "loaded": self._loaded,
+            "seconds": startup_timings.get(self.name)
+        }
@@ -0,0 +1,146 @@
+"""
+Compact in-process vector index
+Exact top-k search over a memory-mapped embedding matrix (.npy) with a chunk-text sidecar.
+A lightweight alternative to Chroma for the small Manim docs corpus.
+
+Index directory layout:
+    embeddings.npy  - (n_chunks, dim) float32, or int8 when quantized
+    scales.npy      - (n_chunks,) float32 per-row scales (quantized indexes only)
+    chunks.json     - [{"text": ..., "metadata": {...}}, ...] in row order
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+EMBEDDINGS_FILE = "embeddings.npy"
+SCALES_FILE = "scales.npy"
+CHUNKS_FILE = "chunks.json"
+
+# Rows of a quantized matrix widened to float32 at a time - bounds the temporary copy per
+# search while keeping every block large enough for an efficient BLAS product
+SCORE_BLOCK_ROWS = 4096
+
+
+class NumpyVectorIndex:
+    """
+    Vector store exposing the `similarity_search` interface used by rag_search.
+    Embeddings are expected to be L2-normalized, so the dot product is the cosine similarity.
+    """
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        chunks: List[Dict[str, Any]],
+        embeddings: Embeddings,
+        scales: Optional[np.ndarray] = None
+    ):
+        if len(matrix) != len(chunks):
+            raise ValueError(f"Index has {len(matrix)} vectors but {len(chunks)} chunks")
+        self.matrix = matrix
+        self.chunks = chunks
+        self.embeddings = embeddings
+        self.scales = scales
+
+    @classmethod
+    def load(cls, index_dir: Path, embeddings: Embeddings) -> "NumpyVectorIndex":
+        """
+        Memory-map an index from disk (pages are shared between processes that load it).
+        """
+        index_dir = Path(index_dir)
+        matrix = np.load(index_dir / EMBEDDINGS_FILE, mmap_mode="r")
+        scales = None
+        if (index_dir / SCALES_FILE).exists():
+            scales = np.load(index_dir / SCALES_FILE, mmap_mode="r")
+        with open(index_dir / CHUNKS_FILE, "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        return cls(matrix, chunks, embeddings, scales)
+
+    @staticmethod
+    def save(
+        index_dir: Path,
+        vectors: Sequence[Sequence[float]],
+        texts: Sequence[str],
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+        quantize: bool = False
+    ) -> None:
+        """
+        Write an index from precomputed (normalized) vectors and their chunk texts.
+        With `quantize`, rows are stored as int8 with a float32 scale per row.
+        """
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        matrix = np.asarray(vectors, dtype=np.float32)
+
+        if quantize:
+            scales = np.abs(matrix).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            quantized = np.round(matrix / scales[:, None]).astype(np.int8)
+            np.save(index_dir / EMBEDDINGS_FILE, quantized)
+            np.save(index_dir / SCALES_FILE, scales.astype(np.float32))
+        else:
+            np.save(index_dir / EMBEDDINGS_FILE, matrix)
+            scales_path = index_dir / SCALES_FILE
+            if scales_path.exists():
+                scales_path.unlink()
+
+        metadatas = metadatas or [{} for _ in texts]
+        with open(index_dir / CHUNKS_FILE, "w", encoding="utf-8") as f:
+            json.dump(
+                [{"text": text, "metadata": metadata} for text, metadata in zip(texts, metadatas)],
+                f,
+                ensure_ascii=False
+            )
+
+    def _scores(self, query_vectors: np.ndarray) -> np.ndarray:
+        """
+        Cosine scores of shape (n_queries, n_chunks). A float32 index is a single matrix product.
+        An int8 index is multiplied block by block against the float32 queries (numpy has no int8
+        product with a wide accumulator, and a mixed-type product would widen the whole matrix);
+        the per-row scales are applied to the scores afterwards.
+        """
+        query_vectors = np.asarray(query_vectors, dtype=np.float32)
+        if self.scales is None:
+            return query_vectors @ self.matrix.T
+
+        scores = np.empty((len(query_vectors), len(self.matrix)), dtype=np.float32)
+        for start in range(0, len(self.matrix), SCORE_BLOCK_ROWS):
+            block = self.matrix[start:start + SCORE_BLOCK_ROWS]
+            np.matmul(query_vectors, block.T.astype(np.float32), out=scores[:, start:start + len(block)])
+        scores *= self.scales
+        return scores
+
+    def _top_k(self, scores: np.ndarray, k: int) -> List[List[int]]:
+        k = min(k, scores.shape[1])
+        if k <= 0:
+            return [[] for _ in range(len(scores))]
+        # argpartition finds the top k in linear time, then only those k are sorted
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+        return np.take_along_axis(top, order, axis=1).tolist()
+
+    def _to_document(self, row: int) -> Document:
+        chunk = self.chunks[row]
+        return Document(page_content=chunk["text"], metadata=chunk.get("metadata") or {})
+
+    def batch_similarity_search_by_vector(self, vectors: Sequence[Sequence[float]], k: int = 4) -> List[List[Document]]:
+        if len(vectors) == 0:
+            return []
+        scores = self._scores(np.asarray(vectors, dtype=np.float32))
+        return [[self._to_document(row) for row in rows] for rows in self._top_k(scores, k)]
+
+    def similarity_search_by_vector(self, embedding: Sequence[float], k: int = 4, **kwargs) -> List[Document]:
+        return self.batch_similarity_search_by_vector([embedding], k=k)[0]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k=k)
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return self.similarity_search(query, k=k)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
@@ -0,0 +1,180 @@
+"""
+Video Delivery
+Moves rendered videos into place without copying and rewrites MP4s whose `moov` atom sits
+after the media data ("faststart"), so players can start before the download finishes.
+The rewrite only relocates atoms and patches chunk offsets - no re-encoding, no ffmpeg.
+"""
+
+import os
+import shutil
+import struct
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Tuple
+
+# Atoms on the path from moov down to the chunk offset tables
+_CONTAINER_ATOMS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+_COPY_CHUNK = 1024 * 1024
+
+
+def _read_atoms(f: BinaryIO, start: int, end: int) -> List[Tuple[bytes, int, int, int]]:
+    """
+    (type, offset, header size, total size) of the atoms between start and end.
+    """
+    atoms = []
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        size, kind = struct.unpack(">I4s", f.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise ValueError(f"Malformed MP4 atom {kind!r} at offset {offset}")
+        atoms.append((kind, offset, header, size))
+        offset += size
+    return atoms
+
+
+def is_faststart(path: Path) -> bool:
+    """
+    Whether the moov atom comes before the media data (or there is nothing to move).
+    """
+    with open(path, "rb") as f:
+        atoms = _read_atoms(f, 0, os.fstat(f.fileno()).st_size)
+    kinds = [kind for kind, _, _, _ in atoms]
+    if b"moov" not in kinds or b"mdat" not in kinds:
+        return True
+    return kinds.index(b"moov") < kinds.index(b"mdat")
+
+
+def _shift_chunk_offsets(moov: bytearray, start: int, end: int, delta: int) -> None:
+    """
+    Add delta to every stco / co64 entry inside moov[start:end], in place.
+    """
+    offset = start
+    while offset + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", moov, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", moov, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise ValueError(f"Malformed MP4 atom {kind!r} inside moov")
+
+        if kind in _CONTAINER_ATOMS:
+            _shift_chunk_offsets(moov, offset + header, offset + size, delta)
+        elif kind in (b"stco", b"co64"):
+            count = struct.unpack_from(">I", moov, offset + header + 4)[0]
+            table = offset + header + 8
+            fmt, width = (">I", 4) if kind == b"stco" else (">Q", 8)
+            for i in range(count):
+                position = table + i * width
+                value = struct.unpack_from(fmt, moov, position)[0] + delta
+                if kind == b"stco" and value > 0xFFFFFFFF:
+                    raise ValueError("Chunk offset overflows stco")
+                struct.pack_into(fmt, moov, position, value)
+        offset += size
+
+
+def _copy_range(src: BinaryIO, dst: BinaryIO, offset: int, size: int) -> None:
+    src.seek(offset)
+    remaining = size
+    while remaining:
+        chunk = src.read(min(_COPY_CHUNK, remaining))
+        if not chunk:
+            raise ValueError("Unexpected end of file")
+        dst.write(chunk)
+        remaining -= len(chunk)
+
+
+def write_faststart(src_path: Path, dst_path: Path) -> bool:
+    """
+    Write src with its moov atom moved in front of the media data to dst.
+    Returns False (writing nothing) if src is already faststart or has a layout this does not
+    handle (moov before some mdat, offsets that would overflow).
+    """
+    with open(src_path, "rb") as src:
+        atoms = _read_atoms(src, 0, os.fstat(src.fileno()).st_size)
+        kinds = [kind for kind, _, _, _ in atoms]
+        if b"moov" not in kinds or b"mdat" not in kinds:
+            return False
+        moov_index = kinds.index(b"moov")
+        first_mdat = kinds.index(b"mdat")
+        last_mdat = len(kinds) - 1 - kinds[::-1].index(b"mdat")
+        if moov_index < first_mdat or moov_index < last_mdat:
+            return False
+
+        _, moov_offset, _, moov_size = atoms[moov_index]
+        src.seek(moov_offset)
+        moov = bytearray(src.read(moov_size))
+        try:
+            # Everything from the first mdat on moves back by the size of moov
+            header = 16 if struct.unpack_from(">I", moov, 0)[0] == 1 else 8
+            _shift_chunk_offsets(moov, header, moov_size, moov_size)
+        except ValueError:
+            return False
+
+        order = [atom for atom in atoms[:first_mdat]] + [atoms[moov_index]] + [
+            atom for i, atom in enumerate(atoms) if i >= first_mdat and i != moov_index
+        ]
+        with open(dst_path, "wb") as dst:
+            for kind, offset, _, size in order:
+                if kind == b"moov":
+                    dst.write(moov)
+                else:
+                    _copy_range(src, dst, offset, size)
+    return True
+
+
+def deliver_video(src_path: Path, dst_path: Path, faststart: bool = True) -> bool:
+    """
+    Put a rendered video at dst_path, consuming src_path: a rename when the file is already
+    faststart (no copy), otherwise a single faststart rewrite. An existing dst is unlinked
+    first rather than overwritten, since it may be hard-linked elsewhere (render cache).
+    Returns whether the video was rewritten.
+    """
+    src_path, dst_path = Path(src_path), Path(dst_path)
+    dst_path.unlink(missing_ok=True)
+
+    rewritten = False
+    if faststart:
+        tmp_path = dst_path.with_name(f".{dst_path.name}.tmp")
+        try:
+            rewritten = write_faststart(src_path, tmp_path)
+        except (OSError, ValueError) as e:
+            print(f"⚠ Warning: faststart rewrite failed for {src_path}: {e}")
+        if rewritten:
+            tmp_path.replace(dst_path)
+            src_path.unlink(missing_ok=True)
+            return True
+        tmp_path.unlink(missing_ok=True)
+
+    shutil.move(str(src_path), str(dst_path))
+    return False
+
+
+def video_etag(path: Path) -> str:
+    """
+    Strong ETag for a delivered video. Videos are never modified in place - they are written
+    once and replaced by unlink + rename - so inode, mtime and size identify the bytes.
+    """
+    stat = os.stat(path)
+    return f'"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match comparison (weak comparison, as RFC 9110 requires for this header).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
@@ -1,81 +1,274 @@
 """
-Script to convert manim_docs.txt to vector embeddings using ChromaDB
+Script to convert the Manim documentation to vector embeddings using ChromaDB
 and HuggingFace embeddings (local, no API required).
 
-This script should be run from the project root directory to generate
-the chroma_db_manim vector store.
+Ingestion is incremental: every chunk is identified by a hash of its text, so only
+new or changed chunks are embedded (in large batches, optionally across worker
+processes) and chunks that no longer exist in the sources are deleted. The vector
+store is written to backend_graph/chroma_db_manim, the path the backend loads.
+
+Usage (from the project root):
+    python docs/convert_manim_docs_to_vector.py                       # docs/manim_docs.txt
+    python docs/convert_manim_docs_to_vector.py docs/ more_docs/ --workers 4
+
+It also writes the BM25 lexical index (manim_docs_bm25.json) used for hybrid
+retrieval next to the vector store. Pass --numpy-index to also export a
+memory-mapped NumPy index (manim_docs_index) for the backend's VECTOR_BACKEND=numpy
+mode (add --quantize for int8 storage). With --output, all indexes are built in the
+parent directory of that path, so a scratch build leaves the backend's indexes alone.
 """
 
-import os
+import sys
+import time
+import hashlib
+import argparse
 from pathlib import Path
-from langchain_community.document_loaders import TextLoader
+from concurrent.futures import ProcessPoolExecutor
+from langchain_core.documents import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
 
+# The index formats live with the backend that loads them
+PROJECT_ROOT = Path(__file__).parent.parent
+BACKEND_DIR = PROJECT_ROOT / "backend_graph"
+sys.path.insert(0, str(BACKEND_DIR))
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+COLLECTION_NAME = "manim_docs"
+
+# File types picked up when a directory is given as a source
+SOURCE_EXTENSIONS = {".txt", ".md", ".rst", ".py"}
+
+# Chroma rejects very large single writes
+CHROMA_WRITE_BATCH = 4000
+
+
+def create_embeddings() -> HuggingFaceEmbeddings:
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True}
+    )
+
+
+# Per-process embedding model for the worker pool
+_worker_embeddings = None
+
+
+def _init_worker():
+    global _worker_embeddings
+    _worker_embeddings = create_embeddings()
 
-def main():
-    # Get the directory where this script is located
-    script_dir = Path(__file__).parent
-    docs_file = script_dir / "manim_docs.txt"
-    
-    # Output directory is in the parent (project root)
-    output_dir = script_dir.parent / "chroma_db_manim"
-    
-    print(f"Loading {docs_file}...")
-    
-    # Load the document
-    loader = TextLoader(str(docs_file), encoding="utf-8")
-    documents = loader.load()
-    
-    print(f"Document loaded. Total characters: {len(documents[0].page_content)}")
-    
-    # Split the document into chunks
+
+def _embed_batch(texts):
+    return _worker_embeddings.embed_documents(texts)
+
+
+def chunk_id(text: str) -> str:
+    """
+    Content hash used as the Chroma id - unchanged chunks keep their id across runs.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def collect_source_files(sources):
+    """
+    Expand files and directories into a sorted list of source files.
+    """
+    files = []
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            files.extend(
+                p for p in sorted(path.rglob("*"))
+                if p.is_file() and p.suffix.lower() in SOURCE_EXTENSIONS
+            )
+        elif path.is_file():
+            files.append(path)
+        else:
+            print(f"⚠ Warning: Source not found, skipping: {path}")
+    return files
+
+
+def source_name(path: Path) -> str:
+    try:
+        return str(path.resolve().relative_to(PROJECT_ROOT.resolve()))
+    except ValueError:
+        return str(path)
+
+
+def load_chunks(files):
+    """
+    Read and split every source file. Returns {chunk_id: Document}; identical chunks
+    appearing several times (or in several files) are stored once.
+    """
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=700,
         chunk_overlap=150,
         length_function=len,
         separators=["\n\n", "\n", " ", ""]
     )
-    
-    splits = text_splitter.split_documents(documents)
-    print(f"Document split into {len(splits)} chunks")
-    
-    # Initialize embeddings (using local HuggingFace model - no API required)
+
+    chunks = {}
+    total_characters = 0
+    for path in files:
+        text = path.read_text(encoding="utf-8")
+        total_characters += len(text)
+        for split in text_splitter.split_text(text):
+            chunks.setdefault(chunk_id(split), Document(
+                page_content=split,
+                metadata={"source": source_name(path)}
+            ))
+    print(f"Loaded {len(files)} files ({total_characters} characters) into {len(chunks)} unique chunks")
+    return chunks
+
+
+def embed_texts(texts, workers: int, batch_size: int):
+    """
+    Embed texts in batches of `batch_size`, spread over `workers` processes.
+    """
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    if workers <= 1 or len(batches) <= 1:
+        embeddings = create_embeddings()
+        return [vector for batch in batches for vector in embeddings.embed_documents(batch)]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(batches)), initializer=_init_worker) as pool:
+        return [vector for batch_vectors in pool.map(_embed_batch, batches) for vector in batch_vectors]
+
+
+def export_numpy_index(vectorstore, index_dir: Path, quantize: bool = False):
+    """
+    Export the Chroma collection's embeddings and chunk texts as a NumPy index
+    (no re-embedding needed).
+    """
+    from vector_index import NumpyVectorIndex
+
+    data = vectorstore._collection.get(include=["embeddings", "documents", "metadatas"])
+    NumpyVectorIndex.save(
+        index_dir,
+        data["embeddings"],
+        data["documents"],
+        data["metadatas"],
+        quantize=quantize
+    )
+    print(f"✓ NumPy index with {len(data['documents'])} chunks written to: {index_dir}")
+
+
+def build_bm25_index(splits, index_path: Path):
+    """
+    Build the BM25 inverted index over the same chunks that were embedded.
+    """
+    from lexical_index import BM25Index
+
+    index = BM25Index.build(
+        [doc.page_content for doc in splits],
+        [doc.metadata for doc in splits]
+    )
+    index.save(index_path)
+    print(f"✓ BM25 index with {len(index)} chunks and {len(index.postings)} terms written to: {index_path}")
+
+
+def main(sources=None, output_dir: Path = None, workers: int = 1, batch_size: int = 256,
+         numpy_index: bool = False, quantize: bool = False):
+    sources = sources or [Path(__file__).parent / "manim_docs.txt"]
+    output_dir = Path(output_dir or BACKEND_DIR / "chroma_db_manim")
+    # The lexical and NumPy indexes must match the vector store, so they are built beside it
+    index_dir = output_dir.parent
+
+    files = collect_source_files(sources)
+    if not files:
+        raise SystemExit("✗ No source files found")
+    print(f"Loading {len(files)} source files...")
+    chunks = load_chunks(files)
+
+    # Open (or create) the persistent vector store the backend loads
     print("Initializing HuggingFace embeddings (running locally)...")
     print("Downloading model if not cached... This may take a moment on first run.")
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
-        model_kwargs={'device': 'cpu'},
-        encode_kwargs={'normalize_embeddings': True}
-    )
-    
-    # Create ChromaDB vector store
-    print("Creating ChromaDB vector store...")
-    vectorstore = Chroma.from_documents(
-        documents=splits,
-        embedding=embeddings,
+    vectorstore = Chroma(
         persist_directory=str(output_dir),
-        collection_name="manim_docs"
+        embedding_function=create_embeddings(),
+        collection_name=COLLECTION_NAME
     )
-    
-    print(f"✓ Successfully created vector store with {len(splits)} documents")
+    collection = vectorstore._collection
+
+    existing_ids = set(collection.get(include=[])["ids"])
+    new_ids = [cid for cid in chunks if cid not in existing_ids]
+    stale_ids = [cid for cid in existing_ids if cid not in chunks]
+    print(f"Chunks: {len(chunks)} total, {len(chunks) - len(new_ids)} unchanged, "
+          f"{len(new_ids)} new/changed, {len(stale_ids)} stale")
+
+    # Delete chunks that no longer exist in the sources
+    for i in range(0, len(stale_ids), CHROMA_WRITE_BATCH):
+        collection.delete(ids=stale_ids[i:i + CHROMA_WRITE_BATCH])
+
+    # Embed and store only the new or changed chunks
+    if new_ids:
+        print(f"Embedding {len(new_ids)} chunks (batch size {batch_size}, {workers} workers)...")
+        start = time.perf_counter()
+        texts = [chunks[cid].page_content for cid in new_ids]
+        vectors = embed_texts(texts, workers, batch_size)
+        elapsed = time.perf_counter() - start
+        print(f"✓ Embedded {len(new_ids)} chunks in {elapsed:.1f}s ({len(new_ids) / max(elapsed, 1e-9):.1f} chunks/s)")
+
+        for i in range(0, len(new_ids), CHROMA_WRITE_BATCH):
+            batch_ids = new_ids[i:i + CHROMA_WRITE_BATCH]
+            collection.upsert(
+                ids=batch_ids,
+                embeddings=vectors[i:i + CHROMA_WRITE_BATCH],
+                documents=[chunks[cid].page_content for cid in batch_ids],
+                metadatas=[chunks[cid].metadata for cid in batch_ids]
+            )
+
+    print(f"✓ Vector store now holds {collection.count()} chunks")
     print(f"✓ Vector store persisted to: {output_dir}")
-    
+
+    build_bm25_index(list(chunks.values()), index_dir / "manim_docs_bm25.json")
+
+    if numpy_index:
+        export_numpy_index(
+            vectorstore,
+            index_dir / "manim_docs_index",
+            quantize=quantize
+        )
+
     # Test query
     print("\nTesting vector store with a sample query...")
     test_query = "How to create a circle in Manim?"
     results = vectorstore.similarity_search(test_query, k=3)
-    
+
     print(f"\nQuery: '{test_query}'")
     print(f"Found {len(results)} relevant chunks:")
     for i, doc in enumerate(results, 1):
         print(f"\n--- Result {i} ---")
         print(doc.page_content[:200] + "...")
-    
+
     return vectorstore
 
 
 if __name__ == "__main__":
-    vectorstore = main()
+    parser = argparse.ArgumentParser(description="Incrementally build the Manim docs vector store")
+    parser.add_argument("sources", nargs="*", type=Path,
+                        help="Source files or directories (default: docs/manim_docs.txt)")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Chroma directory (default: backend_graph/chroma_db_manim); the BM25 "
+                             "and NumPy indexes are written to its parent directory")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Embedding worker processes (default: 1)")
+    parser.add_argument("--batch-size", type=int, default=256,
+                        help="Chunks per embedding batch (default: 256)")
+    parser.add_argument("--numpy-index", action="store_true",
+                        help="Also export a memory-mapped NumPy index (manim_docs_index)")
+    parser.add_argument("--quantize", action="store_true",
+                        help="Store the NumPy index as int8 with per-row scales")
+    args = parser.parse_args()
+
+    vectorstore = main(
+        sources=args.sources,
+        output_dir=args.output,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        numpy_index=args.numpy_index,
+        quantize=args.quantize
+    )
     print("\n✓ Script completed successfully!")
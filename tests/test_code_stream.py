@@ -0,0 +1,49 @@
+from code_stream import CodeStreamChecker
+
+DECORATED = '''from dataclasses import dataclass
+from manim import *
+
+
+@dataclass
+class Node:
+    label: str
+
+
+class Scene1(Scene):
+    def construct(self):
+        self.play(Write(Text(Node("a").label)))
+'''
+
+
+def stream(text, chunk_size=1, fenced=False):
+    checker = CodeStreamChecker()
+    body = f"```python\n{text}```\nSome commentary." if fenced else text
+    for i in range(0, len(body), chunk_size):
+        problem = checker.feed(body[i:i + chunk_size])
+        assert problem is None, problem
+    return checker.finish()
+
+
+def test_decorated_class_is_not_aborted():
+    for chunk_size in (1, 7, 64):
+        code, problem = stream(DECORATED, chunk_size)
+        assert problem is None
+        assert code == DECORATED.strip()
+
+
+def test_stacked_decorators_before_last_definition():
+    text = "import functools\n\n@functools.lru_cache()\n@staticmethod\ndef f():\n    return 1\n" + DECORATED
+    assert stream(text)[1] is None
+
+
+def test_fence_only_closes_at_line_start():
+    text = 's = "a```b"\n' + DECORATED
+    code, problem = stream(text, fenced=True)
+    assert problem is None
+    assert code == text.strip()
+
+
+def test_syntax_error_still_aborts_early():
+    checker = CodeStreamChecker()
+    problems = [checker.feed(line + "\n") for line in ("x = (1 +* 2)", "", "class Scene1(Scene):")]
+    assert problems[-1] is not None and problems[-1].startswith("Syntax error")
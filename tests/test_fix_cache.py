@@ -0,0 +1,29 @@
+from fix_cache import error_signatures, _rule_tex_math_mode
+
+CODE = '''from manim import *
+
+class Scene1(Scene):
+    def construct(self):
+        title = Tex("Plain title")
+        eq = VGroup(Tex("label"), Tex("x^2 + y_1"))
+        self.play(Write(title), Write(eq))
+'''
+
+TRACEBACK = '''Traceback (most recent call last):
+  File "/tmp/tmpab.py", line 6, in construct
+    eq = VGroup(Tex("label"), Tex("x^2 + y_1"))
+  File "/usr/lib/python3/site-packages/manim/mobject/text/tex_mobject.py", line 400, in __init__
+ValueError: latex error converting to dvi. See log output above or the log file: media/Tex/x.log
+! Missing $ inserted.'''
+
+
+def test_tex_math_mode_only_rewrites_the_failing_call():
+    signature = error_signatures(TRACEBACK)[0]
+    patched = _rule_tex_math_mode(signature, CODE)
+    assert 'title = Tex("Plain title")' in patched
+    assert 'VGroup(Tex("label"), MathTex("x^2 + y_1"))' in patched
+
+
+def test_tex_math_mode_needs_the_failing_line():
+    signature = dict(error_signatures(TRACEBACK)[0], line=None)
+    assert _rule_tex_math_mode(signature, CODE) is None
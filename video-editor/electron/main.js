@@ -989,7 +989,9 @@ ipcMain.handle('render-manim', async (event, sessionId, code, sceneName = 'Scene
                 {
                     filename: filename,
                     code: code,
-                    SceneName: sceneName
+                    SceneName: sceneName,
+                    // Stable per-session module: unchanged animations reuse cached partial movies
+                    session_id: sessionId
                 },
                 {
                     responseType: 'arraybuffer',
@@ -1021,6 +1023,10 @@ ipcMain.handle('render-manim', async (event, sessionId, code, sceneName = 'Scene
 
             // Check for code file path in headers
             const codeFilePathHeader = response.headers['x-code-file-path'];
+            const cachedAnimations = response.headers['x-partial-cache-hits'];
+            if (cachedAnimations !== undefined) {
+                console.log(`Render reused ${cachedAnimations}/${response.headers['x-partial-cache-animations']} cached animations`);
+            }
             
             // Final check if cancelled before sending completion
             if (!activeGenerations.has(taskId)) {